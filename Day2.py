@@ -5,6 +5,8 @@ from google.adk.models.google_llm import Gemini
 from google.adk.runners import InMemoryRunner
 from google.adk.tools import AgentTool
 from google.adk.code_executors import BuiltInCodeExecutor
+from tool_cache import cached_tool, ToolCacheMetricsPlugin
+from tracing_plugin import TracingPlugin, write_traces
 
 # ---------------------- GOOGLE API KEY ----------------------
 GOOGLE_API_KEY = "GOOGLE_API_KEY" 
@@ -42,6 +44,8 @@ retry_config = types.HttpRetryOptions(
 )
 
 # ---------------------- TOOL 1: PAYMENT FEE LOOKUP ----------------------
+# Pure lookup: cached across sessions, cleared with invalidate_tag("fee_table")
+@cached_tool(ttl=300, tags=("fee_table",), normalize_strings=True)
 def get_fee_for_payment_method(method: str) -> dict:
     """Looks up the transaction fee percentage for a given payment method."""
     fee_database = {
@@ -50,7 +54,7 @@ def get_fee_for_payment_method(method: str) -> dict:
         "bank transfer": 0.01,         
     }
 
-    fee = fee_database.get(method.lower())
+    fee = fee_database.get(method.strip().lower())
     if fee is not None:
         return {"status": "success", "fee_percentage": fee}
     else:
@@ -60,14 +64,16 @@ print("-------------Fee lookup function created-------------")
 print(f"Test: {get_fee_for_payment_method('platinum credit card')}")
 
 # ---------------------- TOOL 2: EXCHANGE RATE LOOKUP ----------------------
+# Pure lookup: cached across sessions, cleared with invalidate_tag("rate_table")
+@cached_tool(ttl=60, tags=("rate_table",), normalize_strings=True)
 def get_exchange_rate(base_currency: str, target_currency: str) -> dict:
     """Looks up and returns the exchange rate between two currencies."""
     rate_database = {
         "usd": {"eur": 0.93, "jpy": 157.50, "inr": 83.58}
     }
 
-    base = base_currency.lower()
-    target = target_currency.lower()
+    base = base_currency.strip().lower()
+    target = target_currency.strip().lower()
     rate = rate_database.get(base, {}).get(target)
     if rate is not None:
         return {"status": "success", "rate": rate}
@@ -103,7 +109,9 @@ currency_agent = LlmAgent(
 print("Currency agent created")
 
 # ---------------------- RUNNER TEST ----------------------
-currency_runner = InMemoryRunner(agent=currency_agent)
+currency_runner = InMemoryRunner(
+    agent=currency_agent, plugins=[ToolCacheMetricsPlugin()]
+)
 
 async def test_currency_agent():
     await currency_runner.run_debug(
@@ -148,7 +156,13 @@ enhanced_currency_agent = LlmAgent(
 print("Enhanced currency agent created")
 
 # ---------------------- FINAL RUNNER ----------------------
-enhanced_runner = InMemoryRunner(agent=enhanced_currency_agent)
+# Traces agent -> model -> tool -> AgentTool(calculation_agent) as one span tree
+tracing_plugin = TracingPlugin(sample_rate=1.0)
+tool_cache_metrics = ToolCacheMetricsPlugin()
+
+enhanced_runner = InMemoryRunner(
+    agent=enhanced_currency_agent, plugins=[tool_cache_metrics, tracing_plugin]
+)
 
 async def main():
     print("Running Currency Conversion Example...\n")
@@ -157,6 +171,12 @@ async def main():
     )
     show_python_code_and_result(response)
 
+    for name, stats in (tool_cache_metrics.last_stats or {}).items():
+        print(f"Tool cache {name} >> {stats}")
+
+    write_traces(list(tracing_plugin.finished_traces), "traces.otlp.json", "traces.collapsed")
+    print("Traces written to traces.otlp.json (OTLP) and traces.collapsed (flamegraph.pl)")
+
 # ---------------------- ENTRY POINT ----------------------
 if __name__ == "__main__":
     import asyncio
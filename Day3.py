@@ -19,17 +19,20 @@ print("✅ Gemini API key setup complete.")
 from google.adk.agents import Agent, LlmAgent
 from google.adk.apps.app import App, EventsCompactionConfig
 from google.adk.models.google_llm import Gemini
-from google.adk.sessions import DatabaseSessionService, InMemorySessionService
+from google.adk.sessions import DatabaseSessionService
 from google.adk.runners import Runner
+from google.adk.tools import preload_memory
 from google.adk.tools.tool_context import ToolContext
 from google.genai import types
+from bounded_session_service import BoundedInMemorySessionService
+from vector_memory import VectorMemoryService
 
 print("✅ ADK components imported successfully.")
 
 # -----------------------------
 # STEP 3: Define helper function to run sessions
 # -----------------------------
-async def run_session_async(runner_instance: Runner, user_queries, session_name="default", session_service=None):
+async def run_session_async(runner_instance: Runner, user_queries, session_name="default", session_service=None, memory_service=None):
     if session_service is None:
         raise ValueError("session_service must be provided")
 
@@ -63,6 +66,13 @@ async def run_session_async(runner_instance: Runner, user_queries, session_name=
                     if text and text != "None":
                         print(f"{MODEL_NAME} > {text}")
 
+        # Index this session's turns so later sessions can recall them
+        if memory_service is not None:
+            session = await session_service.get_session(
+                app_name=app_name, user_id=USER_ID, session_id=session.id
+            )
+            await memory_service.add_session_to_memory(session)
+
     # Await the inner function
     await inner(user_queries)
 
@@ -138,8 +148,9 @@ async def main():
         name="text_chat_bot",
         description="A simple text chatbot"
     )
-    # Use an in-memory service for this step
-    session_service_step5 = InMemorySessionService()
+    # Use an in-memory service for this step (idle sessions spill to disk
+    # once the budget is exceeded)
+    session_service_step5 = BoundedInMemorySessionService(max_sessions=1000)
     runner_step5 = Runner(agent=root_agent_step5, app_name=APP_NAME, session_service=session_service_step5)
     print("✅ Stateful agent initialized!")
 
@@ -159,29 +170,40 @@ async def main():
     # -----------------------------
     # STEP 6: Persistent Sessions using SQLite
     # -----------------------------
+    # preload_memory adds the top-k most relevant past turns (from any
+    # session) to each request instead of replaying whole histories.
     chatbot_agent_step6 = LlmAgent(
         model=Gemini(model=MODEL_NAME, retry_options=retry_config),
         name="text_chat_bot",
-        description="A text chatbot with persistent memory"
+        description="A text chatbot with persistent memory",
+        tools=[preload_memory],
     )
     db_url = "sqlite:///my_agent_data.db"
     session_service_step6 = DatabaseSessionService(db_url=db_url)
-    runner_step6 = Runner(agent=chatbot_agent_step6, app_name=APP_NAME, session_service=session_service_step6)
-    print("✅ Upgraded to persistent sessions!")
+    memory_service_step6 = VectorMemoryService(root_dir="agent_memory", top_k=5)
+    runner_step6 = Runner(
+        agent=chatbot_agent_step6,
+        app_name=APP_NAME,
+        session_service=session_service_step6,
+        memory_service=memory_service_step6,
+    )
+    print("✅ Upgraded to persistent sessions with long-term memory!")
 
     await run_session_async(
         runner_step6,
         ["Hi, I am Manoj! What is the capital of India?", "Hello! What is my name?"],
         "test-db-session-01",
-        session_service_step6
+        session_service_step6,
+        memory_service_step6,
     )
     await run_session_async(
         runner_step6,
         ["What is the capital of India?", "Hello! What is my name?"],
         "test-db-session-01",
-        session_service_step6
+        session_service_step6,
+        memory_service_step6,
     )
-    await run_session_async(runner_step6, ["Hello! What is my name?"], "test-db-session-02", session_service_step6)
+    await run_session_async(runner_step6, ["Hello! What is my name?"], "test-db-session-02", session_service_step6, memory_service_step6)
 
     # -----------------------------
     # STEP 7: Check data in SQLite
@@ -204,7 +226,7 @@ async def main():
         tools=[save_userinfo, retrieve_userinfo],
     )
     # Use a new in-memory service for this step
-    session_service_step10 = InMemorySessionService()
+    session_service_step10 = BoundedInMemorySessionService(max_sessions=1000)
     runner_step10 = Runner(agent=root_agent_step10, session_service=session_service_step10, app_name="default")
     print("✅ Agent with session state tools initialized!")
 
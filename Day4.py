@@ -15,6 +15,7 @@ from google.adk.agents.callback_context import CallbackContext
 from google.adk.models.llm_request import LlmRequest
 from google.adk.plugins.base_plugin import BasePlugin
 from google.genai import types
+from payload_store import PayloadOffloadPlugin, PayloadStore, resolves_payloads
 
 # --- 1. Set up Google API Key ---
 GOOGLE_API_KEY = "GOOGLE_API_KEY"
@@ -70,12 +71,19 @@ retry_config = types.HttpRetryOptions(
     http_status_codes=[429, 500, 503, 504],
 )
 
+# Large tool outputs (e.g. raw search results) are kept out of the model's
+# context: the model sees a short payload handle instead.
+payload_store = PayloadStore(threshold_bytes=2048)
+
 # Define a custom tool
+@resolves_payloads(payload_store)
 def count_papers(papers: List[str]):
     """
-    This function counts the number of papers in a list of strings.
+    This function counts the number of papers in a list.
     Args:
-      papers: A list of strings, where each string is a research paper.
+      papers: A list with one entry per research paper (e.g. the items of the
+        search results' JSON array), or a list holding a single payload
+        handle ("payload://...").
     Returns:
       The number of papers in the list.
     """
@@ -89,7 +97,9 @@ google_search_agent = LlmAgent(
     name="google_search_agent",
     model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
     description="Searches for information using Google search",
-    instruction="Use the google_search tool to find information on the given topic. Return the raw search results.",
+    instruction="""Use the google_search tool to find information on the given topic.
+    Return the results as a JSON array with one object per paper, each with
+    "title", "url" and "snippet" fields. Return only the JSON array.""",
     tools=[google_search],
 )
 
@@ -102,7 +112,10 @@ research_agent_with_plugin = LlmAgent(
    You must follow these steps:
    1) Find research papers on the user provided topic using the 'google_search_agent'. 
    2) Then, pass the papers to 'count_papers' tool to count the number of papers returned.
-   3) Return both the list of research papers and the total number of papers.
+      If the search result has a 'payload_handle', pass [payload_handle] as the papers as-is.
+   3) Return the total number of papers. If the search result has a 'payload_handle',
+      you only see its 'preview' (the first few papers), so list those as a sample
+      and say how many papers there are in total. Do not invent the rest.
    """,
     tools=[AgentTool(agent=google_search_agent), count_papers],
 )
@@ -118,6 +131,7 @@ async def main():
         plugins=[
             LoggingPlugin(),  # Handles standard Observability logging
             CountInvocationPlugin(),  
+            PayloadOffloadPlugin(payload_store),  # Must be last: it replaces tool results
         ],
     )
     print("✅ Runner configured with LoggingPlugin and CountInvocationPlugin.")
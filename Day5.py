@@ -1,5 +1,6 @@
 import os
 import json
+import httpx
 import requests
 import subprocess
 import time
@@ -15,8 +16,10 @@ from google.adk.agents.remote_a2a_agent import (
 )
 from google.adk.models.google_llm import Gemini
 from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
 from google.genai import types
+from bounded_session_service import BoundedInMemorySessionService
+from tool_cache import cached_tool
+from tracing_plugin import TracingPlugin, traced_httpx_client, write_traces
 
 warnings.filterwarnings("ignore")
 
@@ -41,7 +44,8 @@ retry_config = types.HttpRetryOptions(
 # ============================
 # 3. PRODUCT LOOKUP TOOL
 # ============================
-def get_product_info(product_name: str) -> str:
+@cached_tool(ttl=300, tags=("product_catalog",), normalize_strings=True)
+def get_product_info(product_name: str) -> dict:
     product_catalog = {
         "iphone 15 pro": "iPhone 15 Pro, $999, Low Stock (8 units), 128GB, Titanium finish",
         "samsung galaxy s24": "Samsung Galaxy S24, $799, In Stock (31 units), 256GB, Phantom Black",
@@ -54,10 +58,13 @@ def get_product_info(product_name: str) -> str:
 
     key = product_name.lower().strip()
     if key in product_catalog:
-        return f"Product: {product_catalog[key]}"
+        return {"status": "success", "product": product_catalog[key]}
     else:
         available = ", ".join([p.title() for p in product_catalog.keys()])
-        return f"Sorry, no info for {product_name}. Available products: {available}"
+        return {
+            "status": "error",
+            "error_message": f"Sorry, no info for {product_name}. Available products: {available}",
+        }
 
 
 print("✅ Product Info Tool Loaded.")
@@ -81,12 +88,25 @@ print("✅ Product Catalog Agent Created.")
 temp_dir = tempfile.gettempdir()
 server_path = os.path.join(temp_dir, "product_catalog_server.py")
 
+# The server imports bounded_session_service.py, response_cache.py,
+# tool_cache.py and tracing_plugin.py from this project directory
+project_dir = os.path.dirname(os.path.abspath(__file__))
+
 server_code = f"""
 import os
+import sys
 from google.adk.agents import LlmAgent
 from google.adk.a2a.utils.agent_to_a2a import to_a2a
 from google.adk.models.google_llm import Gemini
+from google.adk.runners import Runner
 from google.genai import types
+from starlette.responses import JSONResponse
+
+sys.path.insert(0, {project_dir!r})
+from bounded_session_service import BoundedInMemorySessionService
+from response_cache import CoalescingLlm
+from tool_cache import cached_tool, tool_cache_stats
+from tracing_plugin import TraceContextMiddleware, TracingPlugin, to_otlp_json
 
 os.environ['GOOGLE_API_KEY'] = '{GOOGLE_API_KEY}'
 
@@ -97,7 +117,8 @@ retry_config = types.HttpRetryOptions(
     http_status_codes=[429, 500, 503, 504],
 )
 
-def get_product_info(product_name: str) -> str:
+@cached_tool(ttl=300, tags=("product_catalog",), normalize_strings=True)
+def get_product_info(product_name: str) -> dict:
     product_catalog = {{
         "iphone 15 pro": "iPhone 15 Pro, $999, Low Stock (8 units), 128GB, Titanium finish",
         "samsung galaxy s24": "Samsung Galaxy S24, $799, In Stock (31 units), 256GB, Phantom Black",
@@ -110,19 +131,58 @@ def get_product_info(product_name: str) -> str:
 
     key = product_name.lower().strip()
     if key in product_catalog:
-        return f"Product: {{product_catalog[key]}}"
+        return {{"status": "success", "product": product_catalog[key]}}
     else:
         available = ", ".join([p.title() for p in product_catalog.keys()])
-        return f"Sorry, no info for {{product_name}}. Available: {{available}}"
+        return {{
+            "status": "error",
+            "error_message": f"Sorry, no info for {{product_name}}. Available: {{available}}",
+        }}
+
+# Identical in-flight requests share one model call; results live for 30s
+product_catalog_model = CoalescingLlm(
+    Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
+    ttl=30.0,
+)
 
 product_catalog_agent = LlmAgent(
-    model=Gemini(model="gemini-2.5-flash-lite", retry_options=retry_config),
+    model=product_catalog_model,
     name="product_catalog_agent",
     instruction="Use get_product_info tool.",
     tools=[get_product_info],
 )
 
-app = to_a2a(product_catalog_agent, port=8001)
+# Server-side spans join the caller's trace via the traceparent header
+tracing_plugin = TracingPlugin(sample_rate=1.0)
+
+# Long-running server: at most 10k sessions stay resident, the rest spill to disk
+session_service = BoundedInMemorySessionService(max_sessions=10_000)
+
+app = to_a2a(
+    product_catalog_agent,
+    port=8001,
+    runner=Runner(
+        app_name=product_catalog_agent.name,
+        agent=product_catalog_agent,
+        session_service=session_service,
+        plugins=[tracing_plugin],
+    ),
+)
+app.add_middleware(TraceContextMiddleware)
+
+async def metrics(request):
+    return JSONResponse({{
+        **product_catalog_model.cache.stats(),
+        "sessions": session_service.stats(),
+        "tool_cache": tool_cache_stats(),
+    }})
+
+async def traces(request):
+    spans = [span for trace in tracing_plugin.finished_traces for span in trace]
+    return JSONResponse(to_otlp_json(spans, service_name="product_catalog_server"))
+
+app.add_route("/metrics", metrics, methods=["GET"])
+app.add_route("/traces", traces, methods=["GET"])
 """
 
 with open(server_path, "w") as f:
@@ -160,6 +220,9 @@ remote_product_catalog_agent = RemoteA2aAgent(
     name="product_catalog_agent",
     description="Remote product catalog agent",
     agent_card=f"http://localhost:8001{AGENT_CARD_WELL_KNOWN_PATH}",
+    # Sends traceparent with every A2A call. No keep-alive: each test below
+    # runs in its own event loop, so pooled connections can't be reused.
+    httpx_client=traced_httpx_client(limits=httpx.Limits(max_keepalive_connections=0)),
 )
 
 print("✅ Remote Agent Connected!")
@@ -177,11 +240,16 @@ customer_support_agent = LlmAgent(
 
 print("✅ Customer Support Agent Ready.")
 
+# Client-side span tree: support agent -> model -> remote A2A hop
+tracing_plugin = TracingPlugin(sample_rate=1.0)
+
+# One bounded session service shared by all test queries
+session_service = BoundedInMemorySessionService(max_sessions=1000)
+
 # ============================
 # 9. TEST FUNCTION (UPDATED)
 # ============================
 async def test_a2a_communication(query: str):
-    session_service = InMemorySessionService()
     session_id = f"session_{uuid.uuid4().hex[:6]}"
 
     await session_service.create_session(
@@ -193,7 +261,8 @@ async def test_a2a_communication(query: str):
     runner = Runner(
         agent=customer_support_agent,
         app_name="support_app",
-        session_service=session_service
+        session_service=session_service,
+        plugins=[tracing_plugin],
     )
 
     print(f"\n👤 User: {query}")
@@ -234,3 +303,7 @@ print("\n🧪 Running Tests...\n")
 asyncio.run(test_a2a_communication("Tell me about the iPhone 15 Pro"))
 asyncio.run(test_a2a_communication("Compare Dell XPS 15 and MacBook Pro 14"))
 asyncio.run(test_a2a_communication("Do you have Sony WH-1000XM5?"))
+
+write_traces(list(tracing_plugin.finished_traces), "traces.otlp.json", "traces.collapsed")
+print("\n🧭 Client traces written to traces.otlp.json and traces.collapsed")
+print("🧭 Server traces: http://localhost:8001/traces")
@@ -0,0 +1,419 @@
+import asyncio
+import bisect
+import json
+import os
+import sqlite3
+import struct
+import sys
+import tempfile
+import time
+import uuid
+import weakref
+import zlib
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.errors.session_not_found_error import SessionNotFoundError
+from google.adk.events.event import Event
+from google.adk.sessions.base_session_service import (
+    BaseSessionService,
+    GetSessionConfig,
+    ListSessionsResponse,
+)
+from google.adk.sessions.session import Session
+from google.adk.sessions.state import State
+
+SessionKey = Tuple[str, str, str]  # (app_name, user_id, session_id)
+
+
+def _split_state(state: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+    """Splits a state dict into (app, user, session) parts; temp: keys are dropped."""
+    app_state, user_state, session_state = {}, {}, {}
+    for key, value in state.items():
+        if key.startswith(State.APP_PREFIX):
+            app_state[key[len(State.APP_PREFIX):]] = value
+        elif key.startswith(State.USER_PREFIX):
+            user_state[key[len(State.USER_PREFIX):]] = value
+        elif not key.startswith(State.TEMP_PREFIX):
+            session_state[key] = value
+    return app_state, user_state, session_state
+
+
+# --- 1. Compact session storage ---
+class _CompactSession:
+    """One session's events as JSON bytes in a single buffer plus offset arrays.
+
+    A resident pydantic Event costs several KB of objects; here an event is
+    its JSON encoding and two array slots, and is only decoded when read.
+    """
+
+    __slots__ = ("state", "last_update_time", "blob", "offsets", "timestamps", "last_event_id", "state_bytes")
+
+    def __init__(self, state: Dict[str, Any], last_update_time: float) -> None:
+        self.state = state
+        self.last_update_time = last_update_time
+        self.blob = bytearray()
+        self.offsets = array("Q", [0])
+        self.timestamps = array("d")
+        self.last_event_id: Optional[str] = None
+        self.state_bytes = len(json.dumps(state, default=str))
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            len(self.blob)
+            + self.offsets.itemsize * len(self.offsets)
+            + self.timestamps.itemsize * len(self.timestamps)
+            + self.state_bytes
+        )
+
+    def append(self, event: Event) -> None:
+        self.blob += event.model_dump_json(exclude_none=True).encode("utf-8")
+        self.offsets.append(len(self.blob))
+        self.timestamps.append(event.timestamp)
+        self.last_event_id = event.id
+
+    def events(self, config: Optional[GetSessionConfig] = None) -> List[Event]:
+        start, end = 0, len(self.timestamps)
+        if config is not None:
+            if config.num_recent_events is not None:
+                start = max(end - config.num_recent_events, 0)
+            if config.after_timestamp is not None:
+                start = max(start, bisect.bisect_left(self.timestamps, config.after_timestamp))
+        return [
+            Event.model_validate_json(self.blob[self.offsets[i] : self.offsets[i + 1]])
+            for i in range(start, end)
+        ]
+
+    def to_bytes(self) -> bytes:
+        """Packs the arrays and event JSON as plain data: no pickle on reload."""
+        offsets, timestamps = self.offsets.tobytes(), self.timestamps.tobytes()
+        header = struct.pack("<QQ", len(offsets), len(timestamps))
+        return zlib.compress(header + offsets + timestamps + self.blob, 1)
+
+    @classmethod
+    def from_bytes(cls, state: Dict[str, Any], last_update_time: float, data: bytes) -> "_CompactSession":
+        session = cls(state, last_update_time)
+        data = zlib.decompress(data)
+        num_offset_bytes, num_timestamp_bytes = struct.unpack_from("<QQ", data)
+        position = struct.calcsize("<QQ")
+        session.offsets = array("Q")
+        session.offsets.frombytes(data[position : position + num_offset_bytes])
+        position += num_offset_bytes
+        session.timestamps = array("d")
+        session.timestamps.frombytes(data[position : position + num_timestamp_bytes])
+        session.blob = bytearray(data[position + num_timestamp_bytes :])
+        if session.timestamps:
+            last_event = session.blob[session.offsets[-2] : session.offsets[-1]]
+            session.last_event_id = json.loads(last_event).get("id")
+        return session
+
+
+# --- 2. Bounded session service ---
+def _close_spill_file(db: sqlite3.Connection, path: Optional[str]) -> None:
+    db.close()
+    if path is not None and os.path.exists(path):
+        os.remove(path)
+
+
+class BoundedInMemorySessionService(BaseSessionService):
+    """An in-memory session service with a memory budget.
+
+    At most `max_sessions` sessions and `max_bytes` of event data stay
+    resident; the least recently used idle sessions are spilled to a local
+    SQLite file and reloaded transparently the next time they are accessed.
+    Like InMemorySessionService, it is meant for a single process.
+
+    Without `spill_path` the spill file is a temp file owned by the service
+    and removed on `close()`, garbage collection or interpreter exit.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10_000,
+        max_bytes: int = 256 * 1024 * 1024,
+        spill_path: Optional[str] = None,
+    ) -> None:
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._owns_spill_file = spill_path is None
+        self.spill_path = spill_path or os.path.join(
+            tempfile.gettempdir(), f"adk_sessions_{os.getpid()}_{uuid.uuid4().hex[:8]}.db"
+        )
+        self._resident: "OrderedDict[SessionKey, _CompactSession]" = OrderedDict()
+        self._resident_bytes = 0
+        self.app_state: Dict[str, Dict[str, Any]] = {}
+        self.user_state: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.spills: int = 0
+        self.reloads: int = 0
+
+        # Used from one event loop at a time, but not always from the thread
+        # that created the service (e.g. an ASGI server's worker thread).
+        self._db = sqlite3.connect(self.spill_path, check_same_thread=False)
+        # The spill file only backs this process's memory, so skip fsyncs.
+        self._db.execute("PRAGMA synchronous = OFF")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                app_name TEXT, user_id TEXT, session_id TEXT,
+                last_update_time REAL, state TEXT, events BLOB,
+                PRIMARY KEY (app_name, user_id, session_id)
+            )
+            """
+        )
+        self._finalizer = weakref.finalize(
+            self,
+            _close_spill_file,
+            self._db,
+            self.spill_path if self._owns_spill_file else None,
+        )
+
+    # --- Residency ---
+    def _enforce_budget(self) -> None:
+        """Spills LRU sessions once over budget, down to 90% so spills batch up."""
+        if len(self._resident) <= self.max_sessions and self._resident_bytes <= self.max_bytes:
+            return
+        max_sessions, max_bytes = int(self.max_sessions * 0.9), int(self.max_bytes * 0.9)
+        rows = []
+        while len(self._resident) > 1 and (
+            len(self._resident) > max_sessions or self._resident_bytes > max_bytes
+        ):
+            key, stored = self._resident.popitem(last=False)
+            self._resident_bytes -= stored.nbytes
+            rows.append((*key, stored.last_update_time, json.dumps(stored.state), stored.to_bytes()))
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.spills += len(rows)
+
+    def _admit(self, key: SessionKey, stored: _CompactSession) -> None:
+        self._resident[key] = stored
+        self._resident_bytes += stored.nbytes
+        self._enforce_budget()
+
+    def _lookup(self, key: SessionKey) -> Optional[_CompactSession]:
+        """Returns a session, reloading it from the spill file if needed."""
+        stored = self._resident.get(key)
+        if stored is not None:
+            self._resident.move_to_end(key)
+            return stored
+        row = self._db.execute(
+            "SELECT last_update_time, state, events FROM sessions"
+            " WHERE app_name = ? AND user_id = ? AND session_id = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            return None
+        with self._db:
+            self._db.execute(
+                "DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?", key
+            )
+        stored = _CompactSession.from_bytes(json.loads(row[1]), row[0], row[2])
+        self.reloads += 1
+        self._admit(key, stored)
+        return stored
+
+    def _exists(self, key: SessionKey) -> bool:
+        return key in self._resident or self._db.execute(
+            "SELECT 1 FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?", key
+        ).fetchone() is not None
+
+    def _to_session(self, key: SessionKey, state: Dict[str, Any], last_update_time: float, events: List[Event]) -> Session:
+        app_name, user_id, session_id = key
+        merged = dict(state)
+        for k, v in self.app_state.get(app_name, {}).items():
+            merged[State.APP_PREFIX + k] = v
+        for k, v in self.user_state.get(app_name, {}).get(user_id, {}).items():
+            merged[State.USER_PREFIX + k] = v
+        return Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=merged,
+            events=events,
+            last_update_time=last_update_time,
+        )
+
+    def _update_scoped_state(self, app_name: str, user_id: str, app_delta: dict, user_delta: dict) -> None:
+        if app_delta:
+            self.app_state.setdefault(app_name, {}).update(app_delta)
+        if user_delta:
+            self.user_state.setdefault(app_name, {}).setdefault(user_id, {}).update(user_delta)
+
+    # --- BaseSessionService ---
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[Dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = session_id.strip() if session_id else str(uuid.uuid4())
+        key = (app_name, user_id, session_id)
+        if self._exists(key):
+            raise AlreadyExistsError(f"Session with id {session_id} already exists.")
+
+        app_delta, user_delta, session_state = _split_state(state or {})
+        self._update_scoped_state(app_name, user_id, app_delta, user_delta)
+        stored = _CompactSession(session_state, time.time())
+        self._admit(key, stored)
+        return self._to_session(key, dict(session_state), stored.last_update_time, [])
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        key = (app_name, user_id, session_id.strip() if session_id else session_id)
+        stored = self._lookup(key)
+        if stored is None:
+            return None
+        return self._to_session(key, dict(stored.state), stored.last_update_time, stored.events(config))
+
+    async def list_sessions(
+        self, *, app_name: str, user_id: Optional[str] = None
+    ) -> ListSessionsResponse:
+        sessions = []
+        for key, stored in self._resident.items():
+            if key[0] == app_name and (user_id is None or key[1] == user_id):
+                sessions.append(self._to_session(key, dict(stored.state), stored.last_update_time, []))
+
+        query = "SELECT app_name, user_id, session_id, last_update_time, state FROM sessions WHERE app_name = ?"
+        params: Tuple[str, ...] = (app_name,)
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params += (user_id,)
+        for *key, last_update_time, state in self._db.execute(query, params):
+            sessions.append(self._to_session(tuple(key), json.loads(state), last_update_time, []))
+
+        sessions.sort(key=lambda s: (s.last_update_time, s.user_id, s.id))
+        return ListSessionsResponse(sessions=sessions)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        key = (app_name, user_id, session_id)
+        stored = self._resident.pop(key, None)
+        if stored is not None:
+            self._resident_bytes -= stored.nbytes
+        with self._db:
+            self._db.execute(
+                "DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?", key
+            )
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        key = (session.app_name, session.user_id, session.id)
+        stored = self._lookup(key)
+        if stored is None:
+            raise SessionNotFoundError(f"Session {session.id} not found.")
+        if event.id and event.id == stored.last_event_id:
+            return event  # Re-delivery of the event we just stored.
+
+        event = await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+
+        self._resident_bytes -= stored.nbytes
+        stored.append(event)
+        stored.last_update_time = event.timestamp
+        if event.actions and event.actions.state_delta:
+            app_delta, user_delta, session_delta = _split_state(event.actions.state_delta)
+            self._update_scoped_state(session.app_name, session.user_id, app_delta, user_delta)
+            if session_delta:
+                stored.state.update(session_delta)
+                stored.state_bytes = len(json.dumps(stored.state, default=str))
+        self._resident_bytes += stored.nbytes
+        self._enforce_budget()
+        return event
+
+    def stats(self) -> Dict[str, Any]:
+        spilled = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        return {
+            "resident_sessions": len(self._resident),
+            "resident_bytes": self._resident_bytes,
+            "spilled_sessions": spilled,
+            "spills": self.spills,
+            "reloads": self.reloads,
+        }
+
+    def close(self) -> None:
+        self._finalizer()
+
+
+# --- 3. Benchmark: memory footprint at 100k sessions ---
+def _measure(service_name: str, num_sessions: int, turns: int, queue) -> None:
+    from google.adk.sessions import InMemorySessionService
+    from google.genai import types
+
+    def rss_mb() -> float:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+    async def run() -> Dict[str, Any]:
+        if service_name == "InMemorySessionService":
+            service = InMemorySessionService()
+        elif service_name == "Bounded (no limit)":
+            service = BoundedInMemorySessionService(max_sessions=10**9, max_bytes=2**62)
+        else:
+            service = BoundedInMemorySessionService(max_sessions=10_000, max_bytes=32 * 2**20)
+
+        before = rss_mb()
+        started = time.perf_counter()
+        for i in range(num_sessions):
+            session = await service.create_session(app_name="bench", user_id=f"user-{i % 1000}")
+            if i == 0:
+                first_session_id = session.id
+            for turn in range(turns):
+                for author, role, text in (
+                    ("user", "user", f"Tell me about the iPhone 15 Pro ({i}/{turn})"),
+                    ("product_catalog_agent", "model", "iPhone 15 Pro, $999, Low Stock (8 units), 128GB, Titanium finish"),
+                ):
+                    await service.append_event(
+                        session,
+                        Event(
+                            invocation_id=f"inv-{i}-{turn}",
+                            author=author,
+                            content=types.Content(role=role, parts=[types.Part(text=text)]),
+                        ),
+                    )
+        build_seconds = time.perf_counter() - started
+        result = {"rss_mb": rss_mb() - before, "build_s": build_seconds}
+
+        # The oldest session is the first to be spilled under a budget.
+        started = time.perf_counter()
+        await service.get_session(app_name="bench", user_id="user-0", session_id=first_session_id)
+        result["get_ms"] = (time.perf_counter() - started) * 1000
+        if isinstance(service, BoundedInMemorySessionService):
+            result.update(service.stats())
+            service.close()
+        return result
+
+    queue.put(asyncio.run(run()))
+
+
+def _benchmark(num_sessions: int = 100_000, turns: int = 2) -> None:
+    import multiprocessing
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{num_sessions:,d} sessions x {turns * 2} events")
+    for service_name in ("InMemorySessionService", "Bounded (no limit)", "Bounded (10k / 32MB)"):
+        queue = context.Queue()
+        process = context.Process(target=_measure, args=(service_name, num_sessions, turns, queue))
+        process.start()
+        result = queue.get()
+        process.join()
+        extra = ""
+        if "resident_sessions" in result:
+            extra = f", {result['resident_sessions']:,d} resident / {result['spilled_sessions']:,d} spilled"
+        print(
+            f"  {service_name:<24} RSS +{result['rss_mb']:7.1f} MB, "
+            f"build {result['build_s']:5.1f}s, get {result['get_ms']:5.2f} ms{extra}"
+        )
+
+
+if __name__ == "__main__":
+    _benchmark(*(int(arg) for arg in sys.argv[1:]))
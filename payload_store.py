@@ -0,0 +1,320 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import mmap
+import os
+import tempfile
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from google.adk.plugins.base_plugin import BasePlugin
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+
+HANDLE_PREFIX = "payload://"
+
+
+def is_handle(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(HANDLE_PREFIX)
+
+
+# --- 1. Memory-mapped payload view ---
+class PayloadList(Sequence):
+    """A read-only list view over a stored payload.
+
+    Records are JSON lines in a memory-mapped file. Only the record offsets
+    are computed up front; `len()` never copies the data and items are decoded
+    one at a time when accessed.
+    """
+
+    def __init__(self, handle: str, buffer: mmap.mmap) -> None:
+        self.handle = handle
+        self._buffer = buffer
+        self._offsets: List[int] = [0]
+        position = buffer.find(b"\n")
+        while position != -1:
+            self._offsets.append(position + 1)
+            position = buffer.find(b"\n", position + 1)
+        if self._offsets[-1] != len(buffer):
+            self._offsets.append(len(buffer))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def view(self, index: int) -> memoryview:
+        """Returns record `index` as a zero-copy view (including the newline)."""
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return memoryview(self._buffer)[start:end]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("payload index out of range")
+        return json.loads(bytes(self.view(index)))
+
+    def __repr__(self) -> str:
+        return f"PayloadList({self.handle!r}, {len(self)} items)"
+
+
+# --- 2. Artifact store ---
+class PayloadStore:
+    """Keeps large tool outputs in local files and hands out short handles.
+
+    Payloads are content-addressed, so storing the same result twice reuses
+    the file. Resolving a handle memory-maps the file instead of reading it.
+    """
+
+    def __init__(self, root_dir: Optional[str] = None, threshold_bytes: int = 2048) -> None:
+        self.root_dir = root_dir or os.path.join(tempfile.gettempdir(), "adk_payloads")
+        self.threshold_bytes = threshold_bytes
+        os.makedirs(self.root_dir, exist_ok=True)
+        self._views: Dict[str, PayloadList] = {}
+
+    def _path(self, handle: str) -> str:
+        payload_id = handle[len(HANDLE_PREFIX):]
+        if not payload_id.isalnum():
+            raise ValueError(f"Invalid payload handle: {handle}")
+        return os.path.join(self.root_dir, payload_id + ".jsonl")
+
+    def put(self, items: Iterable[Any]) -> str:
+        data = b"".join(
+            json.dumps(item, ensure_ascii=False).encode("utf-8") + b"\n" for item in items
+        )
+        handle = HANDLE_PREFIX + hashlib.sha256(data).hexdigest()[:24]
+        path = self._path(handle)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return handle
+
+    def resolve(self, handle: str) -> PayloadList:
+        view = self._views.get(handle)
+        if view is None:
+            with open(self._path(handle), "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            view = PayloadList(handle, buffer)
+            self._views[handle] = view
+        return view
+
+    def close(self) -> None:
+        for view in self._views.values():
+            view._buffer.close()
+        self._views.clear()
+
+
+def split_records(result: Any) -> Optional[List[Any]]:
+    """Returns a tool result's records if it is a list, else None.
+
+    Text counts as a list only if it is a JSON array (optionally in a
+    ```json fence), so the records are the items the tool actually returned.
+    """
+    if isinstance(result, dict) and set(result) == {"result"}:
+        result = result["result"]
+    if isinstance(result, str):
+        text = result.strip()
+        if text.startswith("```") and text.endswith("```"):
+            text = text[3:-3].strip()
+            if text.startswith("json"):
+                text = text[4:]
+        try:
+            result = json.loads(text)
+        except ValueError:
+            return None
+    if isinstance(result, (list, tuple)):
+        return list(result)
+    return None
+
+
+# --- 3. Offloading large tool results ---
+class PayloadOffloadPlugin(BasePlugin):
+    """Replaces list results above the store's size limit with a payload handle.
+
+    The model only sees the handle, the item count and a short preview; tools
+    decorated with `resolves_payloads` get the full data back from the store.
+    Results that are not lists (see `split_records`) are left inline.
+    Register it last: a plugin that returns a result ends the callback chain.
+    """
+
+    def __init__(self, store: PayloadStore, preview_items: int = 5) -> None:
+        super().__init__(name="payload_offload")
+        self.store = store
+        self.preview_items = preview_items
+        self.offloaded: int = 0
+        self.bytes_offloaded: int = 0
+
+    async def after_tool_callback(
+        self,
+        *,
+        tool: BaseTool,
+        tool_args: Dict[str, Any],
+        tool_context: ToolContext,
+        result: Any,
+    ) -> Optional[Dict[str, Any]]:
+        size = len(json.dumps(result, ensure_ascii=False, default=str).encode("utf-8"))
+        if size <= self.store.threshold_bytes:
+            return None
+        records = split_records(result)
+        if records is None:
+            return None
+        handle = self.store.put(records)
+        self.offloaded += 1
+        self.bytes_offloaded += size
+        return {
+            "status": "success",
+            "payload_handle": handle,
+            "num_items": len(records),
+            "size_bytes": size,
+            "preview": [str(record)[:120] for record in records[: self.preview_items]],
+            "note": "Full result stored out of band. Pass payload_handle to tools as-is.",
+        }
+
+
+def resolves_payloads(store: PayloadStore):
+    """Decorator for tools that accept payload handles in place of data.
+
+    An argument that is a handle, or a list holding a single handle, is
+    replaced with the stored `PayloadList` before the tool runs. An unknown
+    or malformed handle returns an error dict instead of calling the tool.
+    """
+
+    def decorator(func):
+        def resolve(value: Any) -> Any:
+            if isinstance(value, list) and len(value) == 1 and is_handle(value[0]):
+                value = value[0]
+            if is_handle(value):
+                return store.resolve(value)
+            return value
+
+        def resolve_all(args: tuple, kwargs: dict) -> tuple:
+            try:
+                args = tuple(resolve(arg) for arg in args)
+                kwargs = {name: resolve(value) for name, value in kwargs.items()}
+            except (OSError, ValueError):
+                error = {
+                    "status": "error",
+                    "error_message": "Unknown or invalid payload handle. "
+                    "Pass payload_handle exactly as the tool returned it.",
+                }
+                return None, None, error
+            return args, kwargs, None
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def wrapper(*args: Any, **kwargs: Any) -> Any:
+                args, kwargs, error = resolve_all(args, kwargs)
+                if error is not None:
+                    return error
+                return await func(*args, **kwargs)
+
+        else:
+
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                args, kwargs, error = resolve_all(args, kwargs)
+                if error is not None:
+                    return error
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# --- 4. Benchmark: large search results, with and without handles ---
+async def _benchmark(num_papers: int = 2000, num_runs: int = 5) -> None:
+    from google.adk.agents import LlmAgent
+    from google.adk.models.llm_request import LlmRequest
+    from google.adk.models.llm_response import LlmResponse
+    from google.adk.runners import InMemoryRunner
+    from google.adk.tools.agent_tool import AgentTool
+    from google.genai import types
+    from pydantic import PrivateAttr
+
+    from prompt_prefix import serialize_request
+    from stub_model import StubLlm
+
+    seconds_per_token = 20e-6  # Simulated prompt processing cost.
+    search_results = json.dumps(
+        [
+            {
+                "title": f"Quantum Computing Advances, Part {i + 1}",
+                "url": f"https://arxiv.org/abs/2501.{i:05d}",
+                "snippet": "A survey of recent results in quantum error correction (2025).",
+            }
+            for i in range(num_papers)
+        ]
+    )
+
+    class SearchStub(StubLlm):
+        async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False):
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=search_results)]))
+
+    class ResearchStub(StubLlm):
+        """Searches, then passes whatever came back (data or handle) to count_papers."""
+
+        _tokens: int = PrivateAttr(default=0)
+
+        async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False):
+            prompt_tokens = len(serialize_request(llm_request)) // 4
+            self._tokens += prompt_tokens
+            await asyncio.sleep(prompt_tokens * seconds_per_token)
+
+            response = llm_request.contents[-1].parts[0].function_response
+            if response is None:
+                call = types.FunctionCall(name="google_search_agent", args={"request": "quantum computing"})
+            elif response.name == "google_search_agent":
+                result = response.response
+                papers = [result["payload_handle"]] if "payload_handle" in result else split_records(result)
+                call = types.FunctionCall(name="count_papers", args={"papers": papers})
+                # The model writes the whole argument back out as output tokens.
+                self._tokens += len(json.dumps(papers)) // 4
+            else:
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=f"Found {response.response['result']} papers.")]))
+                return
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(function_call=call)]))
+
+    async def run(offload: bool) -> None:
+        store = PayloadStore()
+
+        @resolves_payloads(store)
+        def count_papers(papers: List[str]):
+            """Counts the number of papers in a list of strings."""
+            return len(papers)
+
+        model = ResearchStub()
+        agent = LlmAgent(
+            name="research_paper_finder_agent",
+            model=model,
+            instruction="Find research papers and count them.",
+            tools=[
+                AgentTool(agent=LlmAgent(name="google_search_agent", model=SearchStub(), description="Searches.")),
+                count_papers,
+            ],
+        )
+        plugins = [PayloadOffloadPlugin(store)] if offload else []
+        runner = InMemoryRunner(agent=agent, plugins=plugins)
+        started = time.perf_counter()
+        for i in range(num_runs):
+            response = await runner.run_debug(
+                "Find recent papers on quantum computing", session_id=f"bench-{i}", quiet=True
+            )
+        elapsed = (time.perf_counter() - started) / num_runs
+        tokens = model._tokens / num_runs
+        label = "payload handles:" if offload else "inline payloads:"
+        print(f"{label:<18} ~{tokens:9.0f} tokens/run, {elapsed * 1000:7.1f} ms/run -> {response[-1].content.parts[0].text}")
+        store.close()
+
+    await run(offload=False)
+    await run(offload=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark())
@@ -0,0 +1,390 @@
+import asyncio
+import hashlib
+import json
+import time
+import weakref
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, AsyncGenerator, Callable, Dict, Optional, Tuple
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.gemini_context_cache_manager import GeminiContextCacheManager
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+from pydantic import PrivateAttr
+
+from stub_model import StubLlm
+
+
+# --- 1. Serialization helpers ---
+def _dumps(payload: Any) -> bytes:
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def _system_instruction(llm_request: LlmRequest) -> Any:
+    instruction = llm_request.config.system_instruction
+    if instruction is None or isinstance(instruction, str):
+        return instruction
+    return instruction.model_dump(mode="json", exclude_none=True)
+
+
+def _tools(llm_request: LlmRequest) -> list:
+    return [
+        tool.model_dump(mode="json", exclude_none=True)
+        for tool in llm_request.config.tools or []
+    ]
+
+
+def serialize_prefix(llm_request: LlmRequest) -> bytes:
+    """Serializes the invariant part of a request: instruction + tool schemas."""
+    return _dumps(
+        {
+            "system_instruction": _system_instruction(llm_request),
+            "tools": _tools(llm_request),
+        }
+    )
+
+
+def serialize_request(llm_request: LlmRequest) -> bytes:
+    """Serializes a request the way it goes over the wire.
+
+    With `config.cached_content` set only the handle and the conversation are
+    sent; otherwise the instruction and tool schemas are sent every time.
+    """
+    contents = [
+        content.model_dump(mode="json", exclude_none=True)
+        for content in llm_request.contents
+    ]
+    if llm_request.config.cached_content:
+        return _dumps(
+            {"cached_content": llm_request.config.cached_content, "contents": contents}
+        )
+    return _dumps(
+        {
+            "system_instruction": _system_instruction(llm_request),
+            "tools": _tools(llm_request),
+            "contents": contents,
+        }
+    )
+
+
+# --- 2. Prefix cache ---
+@dataclass(frozen=True)
+class PromptPrefix:
+    """A pre-serialized instruction + tool prefix and its context-cache handle."""
+
+    handle: str
+    payload: bytes
+    tool_names: Tuple[str, ...]
+
+
+class PromptPrefixCache:
+    """Builds each agent's invariant prompt prefix once and reuses it.
+
+    The key is the rendered system instruction plus, for each tool, its name
+    and a hash of its declaration. A tool's hash is computed once, the first
+    time its function (or tool object) is seen, so building the key costs a
+    few dict lookups per turn, and a redefined tool gets a new prefix instead
+    of the stale handle.
+    """
+
+    def __init__(self) -> None:
+        self._prefixes: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], PromptPrefix] = {}
+        self._tool_hashes: "weakref.WeakKeyDictionary[Any, str]" = weakref.WeakKeyDictionary()
+        self.hits: int = 0
+        self.builds: int = 0
+        self.build_seconds: float = 0.0
+        self.key_seconds: float = 0.0
+
+    def _tool_hash(self, tool: Any) -> str:
+        # ADK re-wraps plain functions in a new FunctionTool every turn, so
+        # the function itself is the stable identity.
+        source = getattr(tool, "func", tool)
+        tool_hash = self._tool_hashes.get(source)
+        if tool_hash is None:
+            declaration = tool._get_declaration()
+            payload = (
+                declaration.model_dump(mode="json", exclude_none=True)
+                if declaration is not None
+                else tool.name
+            )
+            tool_hash = hashlib.sha256(_dumps(payload)).hexdigest()
+            self._tool_hashes[source] = tool_hash
+        return tool_hash
+
+    def get_or_build(
+        self, llm_request: LlmRequest, create_cache: Callable[[bytes], str]
+    ) -> PromptPrefix:
+        started = time.process_time()
+        tools = tuple(
+            (name, self._tool_hash(tool)) for name, tool in llm_request.tools_dict.items()
+        )
+        key = (str(llm_request.config.system_instruction), tools)
+        self.key_seconds += time.process_time() - started
+        prefix = self._prefixes.get(key)
+        if prefix is not None:
+            self.hits += 1
+            return prefix
+
+        started = time.process_time()
+        payload = serialize_prefix(llm_request)
+        prefix = PromptPrefix(
+            handle=create_cache(payload),
+            payload=payload,
+            tool_names=tuple(name for name, _ in tools),
+        )
+        self.build_seconds += time.process_time() - started
+        self.builds += 1
+        self._prefixes[key] = prefix
+        return prefix
+
+    def clear(self) -> None:
+        self._prefixes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "prefixes": len(self._prefixes),
+            "builds": self.builds,
+            "hits": self.hits,
+            "build_seconds": self.build_seconds,
+            "key_seconds": self.key_seconds,
+            "prefix_bytes": sum(len(p.payload) for p in self._prefixes.values()),
+        }
+
+
+# --- 3. Model wrapper ---
+class PrefixCachingLlm(BaseLlm):
+    """Sends the cached prefix handle instead of the instruction and tools.
+
+    The inner model must expose `create_context_cache(payload: bytes) -> str`
+    and accept `config.cached_content`, as the local stand-in below does.
+    Models without it receive the request unchanged; for Gemini, use ADK's
+    `App(context_cache_config=ContextCacheConfig(...))` instead.
+    """
+
+    inner: BaseLlm
+    prefixes: PromptPrefixCache
+
+    def __init__(self, inner: BaseLlm, **kwargs: Any) -> None:
+        kwargs.setdefault("prefixes", PromptPrefixCache())
+        super().__init__(model=inner.model, inner=inner, **kwargs)
+
+    @property
+    def capabilities(self):
+        return self.inner.capabilities
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        create_cache = getattr(self.inner, "create_context_cache", None)
+        config = llm_request.config
+        if create_cache is not None and not config.cached_content and (
+            config.system_instruction or config.tools
+        ):
+            prefix = self.prefixes.get_or_build(llm_request, create_cache)
+            llm_request = llm_request.model_copy(
+                update={
+                    "config": config.model_copy(
+                        update={
+                            "system_instruction": None,
+                            "tools": None,
+                            "cached_content": prefix.handle,
+                        }
+                    )
+                }
+            )
+
+        async for response in self.inner.generate_content_async(llm_request, stream):
+            yield response
+
+
+# --- 4. Local model stand-in with a context cache ---
+class _LocalCaches:
+    """The `client.aio.caches` surface GeminiContextCacheManager calls."""
+
+    def __init__(self, model: "LocalContextCacheModel") -> None:
+        self._model = model
+
+    async def create(
+        self, *, model: str, config: types.CreateCachedContentConfig
+    ) -> types.CachedContent:
+        payload = _dumps(
+            config.model_dump(
+                mode="json",
+                exclude_none=True,
+                exclude={"http_options", "display_name", "ttl"},
+            )
+        )
+        return types.CachedContent(name=self._model.create_context_cache(payload))
+
+    async def delete(self, *, name: str) -> None:
+        self._model._context_caches.pop(name, None)
+
+
+class LocalContextCacheModel(StubLlm):
+    """A StubLlm that serializes what it is sent and keeps a context cache.
+
+    It records the serialization CPU time and bytes it would have put on the
+    wire, so runs with and without prefix caching can be compared. Requests
+    with `cache_config` (from `App(context_cache_config=...)`) go through ADK's
+    GeminiContextCacheManager against a local cache store, exactly as they
+    would against Gemini, and responses carry usage and cache metadata.
+    """
+
+    _context_caches: Dict[str, bytes] = PrivateAttr(default_factory=dict)
+    _bytes_sent: int = PrivateAttr(default=0)
+    _serialize_seconds: float = PrivateAttr(default=0.0)
+    _client: Any = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        self._client = SimpleNamespace(
+            vertexai=False, aio=SimpleNamespace(caches=_LocalCaches(self))
+        )
+
+    @property
+    def bytes_sent(self) -> int:
+        return self._bytes_sent
+
+    @property
+    def serialize_seconds(self) -> float:
+        return self._serialize_seconds
+
+    def create_context_cache(self, payload: bytes) -> str:
+        handle = "cachedContents/" + hashlib.sha256(payload).hexdigest()[:16]
+        self._context_caches[handle] = payload
+        self._bytes_sent += len(payload)
+        return handle
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        cache_metadata = None
+        if llm_request.cache_config is not None:
+            # Fingerprinting re-serializes the prefix, so it is counted too.
+            started = time.process_time()
+            manager = GeminiContextCacheManager(self._client)
+            cache_metadata = await manager.handle_context_caching(llm_request)
+            self._serialize_seconds += time.process_time() - started
+
+        handle: Optional[str] = llm_request.config.cached_content
+        if handle and handle not in self._context_caches:
+            raise ValueError(f"Unknown context cache handle: {handle}")
+
+        started = time.process_time()
+        wire = serialize_request(llm_request)
+        self._serialize_seconds += time.process_time() - started
+        self._bytes_sent += len(wire)
+
+        # Rough token counts (4 bytes/token), including the cached prefix as
+        # Gemini does; ADK gates cache creation on the previous prompt's count.
+        cached_tokens = len(self._context_caches.get(handle, b"")) // 4
+        usage = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=len(wire) // 4 + cached_tokens,
+            cached_content_token_count=cached_tokens or None,
+        )
+        async for response in super().generate_content_async(llm_request, stream):
+            response.usage_metadata = usage
+            if cache_metadata is not None:
+                response.cache_metadata = cache_metadata.model_copy()
+            yield response
+
+
+# --- 5. Benchmark: Day4's research agent, before and after ---
+async def _benchmark(num_requests: int = 200) -> None:
+    """Replays `num_requests` user turns, as one-turn and five-turn sessions."""
+    from typing import List
+
+    from google.adk.agents import LlmAgent
+    from google.adk.agents.context_cache_config import ContextCacheConfig
+    from google.adk.apps.app import App
+    from google.adk.runners import InMemoryRunner
+    from google.adk.tools.agent_tool import AgentTool
+    from google.genai import types
+
+    def count_papers(papers: List[str]):
+        """
+        This function counts the number of papers in a list of strings.
+        Args:
+          papers: A list of strings, where each string is a research paper.
+        Returns:
+          The number of papers in the list.
+        """
+        return len(papers)
+
+    async def run(mode: str, turns: int) -> Tuple[LocalContextCacheModel, Optional[PromptPrefixCache]]:
+        stand_in = LocalContextCacheModel(
+            tool_name="count_papers",
+            tool_args={"papers": ["Paper A", "Paper B", "Paper C"]},
+        )
+        model = PrefixCachingLlm(stand_in) if mode == "prefix" else stand_in
+        google_search_agent = LlmAgent(
+            name="google_search_agent",
+            model=StubLlm(),
+            description="Searches for information using Google search",
+            instruction="Use the google_search tool to find information on the given topic. Return the raw search results.",
+        )
+        agent = LlmAgent(
+            name="research_paper_finder_agent",
+            model=model,
+            instruction="""Your task is to find research papers and count them.
+
+   You must follow these steps:
+   1) Find research papers on the user provided topic using the 'google_search_agent'.
+   2) Then, pass the papers to 'count_papers' tool to count the number of papers returned.
+   3) Return both the list of research papers and the total number of papers.
+   """,
+            tools=[AgentTool(agent=google_search_agent), count_papers],
+        )
+        # ADK's own per-session context cache, configured on the App.
+        context_cache_config = (
+            ContextCacheConfig(min_tokens=0) if mode == "app_cache" else None
+        )
+        app = App(
+            name="research_app",
+            root_agent=agent,
+            context_cache_config=context_cache_config,
+        )
+        runner = InMemoryRunner(app=app)
+        for _ in range(num_requests // turns):
+            session = await runner.session_service.create_session(
+                app_name=runner.app_name, user_id="bench"
+            )
+            for _ in range(turns):
+                message = types.Content(
+                    role="user",
+                    parts=[types.Part(text="Find recent papers on quantum computing")],
+                )
+                async for _ in runner.run_async(
+                    user_id="bench", session_id=session.id, new_message=message
+                ):
+                    pass
+        return stand_in, model.prefixes if mode == "prefix" else None
+
+    # ADK's context cache is per session and starts on a session's second
+    # model call, so it pays off only once sessions run several turns.
+    for turns in (1, 5):
+        print(f"{turns}-turn sessions:")
+        for label, mode in (
+            ("full request every turn:", "none"),
+            ("App context cache:", "app_cache"),
+            ("PrefixCachingLlm handle:", "prefix"),
+        ):
+            stand_in, prefixes = await run(mode, turns)
+            # Key lookups and prefix builds are per-request CPU too.
+            cpu_seconds = stand_in.serialize_seconds
+            if prefixes is not None:
+                cpu_seconds += prefixes.key_seconds + prefixes.build_seconds
+            per_call_us = cpu_seconds / stand_in.calls * 1e6
+            print(
+                f"  {label:<26} {stand_in.calls} model calls, "
+                f"{stand_in.bytes_sent / stand_in.calls:8.1f} bytes/request, "
+                f"{per_call_us:7.1f} us request-building CPU/request"
+            )
+            if prefixes is not None:
+                print(f"    {prefixes.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark())
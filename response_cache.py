@@ -0,0 +1,273 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+
+# --- 1. Single-flight cache ---
+class SingleFlightCache:
+    """A short-TTL LRU cache where identical in-flight keys share one call.
+
+    The first caller for a key runs the producer; anyone asking for the same
+    key while it is still running awaits that result instead of starting a
+    second one. Finished results are kept for `ttl` seconds (0 disables the
+    cache and leaves only the coalescing).
+    """
+
+    def __init__(
+        self,
+        ttl: float = 30.0,
+        maxsize: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._clock = clock
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.requests: int = 0
+        self.misses: int = 0
+        self.cache_hits: int = 0
+        self.coalesced: int = 0
+
+    async def get_or_run(self, key: str, producer: Callable[[], Awaitable[Any]]) -> Any:
+        """Returns the cached/in-flight value for `key`, or runs `producer`."""
+        self.requests += 1
+        while True:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.cache_hits += 1
+                    return value
+                del self._entries[key]
+
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            try:
+                value = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The leader was cancelled, not us: take over and run it.
+                if future.cancelled():
+                    continue
+                raise
+            self.coalesced += 1
+            return value
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await producer()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody is waiting.
+            raise
+        finally:
+            del self._inflight[key]
+
+        future.set_result(value)
+        if self.ttl > 0:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        shared = self.cache_hits + self.coalesced
+        return {
+            "requests": self.requests,
+            "model_calls": self.misses,
+            "cache_hits": self.cache_hits,
+            "coalesced": self.coalesced,
+            "shared_ratio": shared / self.requests if self.requests else 0.0,
+            "cached_entries": len(self._entries),
+            "in_flight": len(self._inflight),
+        }
+
+
+# --- 2. Request normalization ---
+def normalize_text(text: str) -> str:
+    """Case-folds and collapses whitespace so trivially different asks match."""
+    return " ".join(text.casefold().split())
+
+
+def request_key(llm_request: LlmRequest) -> str:
+    """Builds a stable cache key for an LLM request.
+
+    Text parts are normalized and the per-invocation function call ids are
+    dropped, so two sessions asking the same thing produce the same key. The
+    whole generation config (instruction, tool schemas, temperature, response
+    schema, safety settings, ...) is part of the key; only transport options
+    are left out.
+    """
+    contents = []
+    for content in llm_request.contents:
+        parts = []
+        for part in content.parts or []:
+            data = part.model_dump(mode="json", exclude_none=True)
+            if "text" in data:
+                data["text"] = normalize_text(data["text"])
+            for field in ("function_call", "function_response"):
+                if field in data:
+                    data[field].pop("id", None)
+            parts.append(data)
+        contents.append({"role": content.role, "parts": parts})
+
+    payload = {
+        "model": llm_request.model,
+        "config": llm_request.config.model_dump(
+            mode="json",
+            exclude_none=True,
+            exclude={"http_options"},
+            fallback=repr,  # e.g. Python callables passed as tools
+        ),
+        "tools": sorted(llm_request.tools_dict),
+        "contents": contents,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+# --- 3. Coalescing model wrapper ---
+class CoalescingLlm(BaseLlm):
+    """Wraps a model so identical requests share one model call.
+
+    Usage:
+      model = CoalescingLlm(Gemini(model="gemini-2.5-flash-lite"), ttl=30)
+      agent = LlmAgent(model=model, ...)
+      model.cache.stats()  # coalesced / cached hit counters
+    """
+
+    inner: BaseLlm
+    cache: SingleFlightCache
+
+    def __init__(
+        self, inner: BaseLlm, ttl: float = 30.0, maxsize: int = 1024, **kwargs: Any
+    ) -> None:
+        kwargs.setdefault("cache", SingleFlightCache(ttl=ttl, maxsize=maxsize))
+        super().__init__(model=inner.model, inner=inner, **kwargs)
+
+    @property
+    def capabilities(self):
+        return self.inner.capabilities
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        if stream:
+            # Partial responses are not shareable; stream straight through.
+            async for response in self.inner.generate_content_async(llm_request, stream):
+                yield response
+            return
+
+        async def call_model() -> list:
+            responses = [
+                response
+                async for response in self.inner.generate_content_async(llm_request)
+            ]
+            if any(response.error_code for response in responses):
+                raise _UncacheableResponse(responses)
+            return responses
+
+        try:
+            responses = await self.cache.get_or_run(request_key(llm_request), call_model)
+        except _UncacheableResponse as e:
+            responses = e.responses
+
+        for response in responses:
+            # Callers may mutate their events, so each one gets its own copy.
+            yield response.model_copy(deep=True)
+
+
+class _UncacheableResponse(Exception):
+    """Carries error responses past the cache so they are never stored."""
+
+    def __init__(self, responses: list) -> None:
+        super().__init__("model returned an error response")
+        self.responses = responses
+
+
+# --- 4. Load test: model calls per 1000 requests ---
+async def _load_test(num_requests: int = 1000, concurrency: int = 50) -> None:
+    from google.adk.agents import LlmAgent
+    from google.adk.runners import InMemoryRunner
+    from google.genai import types
+
+    from stub_model import StubLlm
+
+    queries = [
+        "Tell me about the iPhone 15 Pro",
+        "tell me about the iphone 15 pro ",
+        "Do you have Sony WH-1000XM5?",
+        "Compare Dell XPS 15 and MacBook Pro 14",
+        "Is the LG UltraWide 34 in stock?",
+    ]
+
+    def get_product_info(product_name: str) -> str:
+        """Looks up a product in the catalog."""
+        return f"Product: {product_name}, $999, In Stock"
+
+    async def run(model: BaseLlm) -> float:
+        agent = LlmAgent(
+            name="product_catalog_agent",
+            model=model,
+            instruction="Use get_product_info tool.",
+            tools=[get_product_info],
+        )
+        runner = InMemoryRunner(agent=agent)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i: int) -> None:
+            async with semaphore:
+                session = await runner.session_service.create_session(
+                    app_name=runner.app_name, user_id="load_test"
+                )
+                message = types.Content(
+                    role="user", parts=[types.Part(text=queries[i % len(queries)])]
+                )
+                async for _ in runner.run_async(
+                    user_id="load_test", session_id=session.id, new_message=message
+                ):
+                    pass
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(num_requests)))
+        return time.perf_counter() - started
+
+    def stub() -> StubLlm:
+        return StubLlm(
+            latency=0.05,
+            tool_name="get_product_info",
+            tool_args={"product_name": "iphone 15 pro"},
+        )
+
+    baseline = stub()
+    elapsed = await run(baseline)
+    print(f"baseline:           {baseline.calls:5d} model calls / {num_requests} requests ({elapsed:.2f}s)")
+
+    for label, ttl in (("coalescing only:", 0.0), ("coalescing + cache:", 30.0)):
+        inner = stub()
+        model = CoalescingLlm(inner, ttl=ttl)
+        elapsed = await run(model)
+        print(f"{label:<20}{inner.calls:5d} model calls / {num_requests} requests ({elapsed:.2f}s)")
+        print(f"  {model.cache.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_load_test())
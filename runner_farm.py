@@ -0,0 +1,286 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+
+from google.adk.runners import Runner
+from google.genai import types
+
+
+# --- 1. Worker process ---
+def _worker_main(
+    runner_factory: Callable[[], Runner],
+    requests: "multiprocessing.Queue",
+    results: "multiprocessing.Queue",
+) -> None:
+    """Runs one Runner in its own event loop until it receives `None`."""
+    asyncio.run(_worker_loop(runner_factory(), requests, results))
+
+
+async def _worker_loop(
+    runner: Runner,
+    requests: "multiprocessing.Queue",
+    results: "multiprocessing.Queue",
+) -> None:
+    loop = asyncio.get_running_loop()
+    pending = set()
+    # Turns of one session run in order; different sessions run concurrently.
+    session_locks: Dict[str, List[Any]] = {}  # session_id -> [lock, users]
+
+    async def handle(request_id: int, user_id: str, session_id: str, text: str) -> None:
+        entry = session_locks.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await run_turn(request_id, user_id, session_id, text)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del session_locks[session_id]
+
+    async def run_turn(request_id: int, user_id: str, session_id: str, text: str) -> None:
+        try:
+            session = await runner.session_service.get_session(
+                app_name=runner.app_name, user_id=user_id, session_id=session_id
+            )
+            if session is None:
+                await runner.session_service.create_session(
+                    app_name=runner.app_name, user_id=user_id, session_id=session_id
+                )
+            message = types.Content(role="user", parts=[types.Part(text=text)])
+            final_text = None
+            num_events = 0
+            async for event in runner.run_async(
+                user_id=user_id, session_id=session_id, new_message=message
+            ):
+                num_events += 1
+                if event.is_final_response() and event.content and event.content.parts:
+                    final_text = "".join(part.text or "" for part in event.content.parts)
+            results.put(
+                (request_id, {"pid": os.getpid(), "text": final_text, "num_events": num_events}, None)
+            )
+        except Exception as e:
+            results.put((request_id, None, f"{type(e).__name__}: {e}"))
+
+    while True:
+        request = await loop.run_in_executor(None, requests.get)
+        if request is None:
+            break
+        task = asyncio.create_task(handle(*request))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    if pending:
+        await asyncio.gather(*pending)
+    await runner.close()
+
+
+# --- 2. Runner farm ---
+class RunnerFarm:
+    """Spreads agent runs over N worker processes, each with its own Runner.
+
+    Requests are routed by session id, so every turn of a session lands on
+    the worker holding that session. Results come back over a shared queue.
+
+    If a worker process dies (its factory raised, or it was OOM-killed or
+    crashed in native code), its in-flight requests fail with RuntimeError
+    and its sessions are refused from then on; the slot is not restarted,
+    since the sessions it held are gone.
+
+    `runner_factory` is called inside each worker and must be picklable
+    (a module-level function), since workers are started with "spawn".
+
+    Usage:
+      async with RunnerFarm(build_runner, num_workers=4) as farm:
+          result = await farm.run("user", "session-1", "Hello!")
+    """
+
+    def __init__(
+        self,
+        runner_factory: Callable[[], Runner],
+        num_workers: Optional[int] = None,
+        start_method: str = "spawn",
+    ) -> None:
+        self.runner_factory = runner_factory
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self._context = multiprocessing.get_context(start_method)
+        self._request_queues: List["multiprocessing.Queue"] = []
+        self._results: Optional["multiprocessing.Queue"] = None
+        self._workers: List[multiprocessing.Process] = []
+        self._futures: Dict[int, asyncio.Future] = {}
+        self._routes: Dict[int, int] = {}  # request_id -> worker slot
+        self._dead: Dict[int, Optional[int]] = {}  # worker slot -> exit code
+        self._ids = itertools.count()
+        self._collector: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._results = self._context.Queue()
+        for _ in range(self.num_workers):
+            requests = self._context.Queue()
+            worker = self._context.Process(
+                target=_worker_main,
+                args=(self.runner_factory, requests, self._results),
+                daemon=True,
+            )
+            worker.start()
+            self._request_queues.append(requests)
+            self._workers.append(worker)
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def _collect(self, poll_interval: float = 0.5) -> None:
+        """Hands results back to the event loop and watches for dead workers."""
+        seen_dead = set()
+        while True:
+            try:
+                item = self._results.get(timeout=poll_interval)
+            except queue.Empty:
+                dead = [
+                    slot
+                    for slot, worker in enumerate(self._workers)
+                    if slot not in seen_dead and not worker.is_alive()
+                ]
+                if not dead:
+                    continue
+                # A worker may have sent results after the get() above timed
+                # out and before it exited. Once it is dead, nothing more can
+                # arrive from it, so resolve whatever is queued first.
+                while True:
+                    try:
+                        item = self._results.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        return
+                    self._loop.call_soon_threadsafe(self._resolve, *item)
+                for slot in dead:
+                    seen_dead.add(slot)
+                    self._loop.call_soon_threadsafe(
+                        self._fail_worker, slot, self._workers[slot].exitcode
+                    )
+                continue
+            if item is None:
+                break
+            self._loop.call_soon_threadsafe(self._resolve, *item)
+
+    def _fail_worker(self, slot: int, exitcode: Optional[int]) -> None:
+        self._dead[slot] = exitcode
+        for request_id in [r for r, s in self._routes.items() if s == slot]:
+            self._resolve(
+                request_id, None, f"worker {slot} exited with code {exitcode}"
+            )
+
+    def _resolve(self, request_id: int, result: Any, error: Optional[str]) -> None:
+        self._routes.pop(request_id, None)
+        future = self._futures.pop(request_id, None)
+        if future is None or future.done():
+            return
+        if error is not None:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(result)
+
+    def worker_for(self, session_id: str) -> int:
+        """Stable session -> worker routing (unlike hash(), same in every process)."""
+        return zlib.crc32(session_id.encode("utf-8")) % self.num_workers
+
+    async def run(self, user_id: str, session_id: str, text: str) -> Dict[str, Any]:
+        """Runs one user turn and returns the final text, event count and worker pid."""
+        if self._loop is None:
+            raise RuntimeError("RunnerFarm has not been started")
+        slot = self.worker_for(session_id)
+        if slot in self._dead:
+            raise RuntimeError(
+                f"worker {slot} for session {session_id!r} exited with code "
+                f"{self._dead[slot]}"
+            )
+        request_id = next(self._ids)
+        future = self._loop.create_future()
+        self._futures[request_id] = future
+        self._routes[request_id] = slot
+        self._request_queues[slot].put(
+            (request_id, user_id, session_id, text)
+        )
+        return await future
+
+    async def close(self) -> None:
+        for requests in self._request_queues:
+            requests.put(None)
+        loop = asyncio.get_running_loop()
+        for worker in self._workers:
+            await loop.run_in_executor(None, worker.join)
+        if self._results is not None:
+            self._results.put(None)
+            await loop.run_in_executor(None, self._collector.join)
+        self._request_queues.clear()
+        self._workers.clear()
+        self._dead.clear()
+        self._loop = None
+
+    async def __aenter__(self) -> "RunnerFarm":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+
+# --- 3. Benchmark: throughput from 1 to N cores ---
+def crunch_numbers(rounds: int) -> dict:
+    """Runs a CPU-heavy hashing loop and returns the final digest."""
+    import hashlib
+
+    digest = b"adk"
+    for _ in range(rounds):
+        digest = hashlib.sha256(digest).digest()
+    return {"status": "success", "digest": digest.hex()[:16]}
+
+
+def build_benchmark_runner() -> Runner:
+    from google.adk.agents import LlmAgent
+    from google.adk.runners import InMemoryRunner
+
+    from stub_model import StubLlm
+
+    agent = LlmAgent(
+        name="cpu_bound_agent",
+        model=StubLlm(tool_name="crunch_numbers", tool_args={"rounds": 200_000}),
+        instruction="Use crunch_numbers for every request.",
+        tools=[crunch_numbers],
+    )
+    return InMemoryRunner(agent=agent)
+
+
+async def _benchmark(num_requests: int = 64) -> None:
+    max_workers = os.cpu_count() or 1
+    worker_counts = sorted({1, *range(2, max_workers + 1, 2), max_workers})
+    baseline = None
+    for num_workers in worker_counts:
+        async with RunnerFarm(build_benchmark_runner, num_workers=num_workers) as farm:
+            # Warm up every worker so process start-up is not timed.
+            await asyncio.gather(
+                *(farm.run("bench", f"warmup-{i}", "go") for i in range(num_workers * 4))
+            )
+            started = time.perf_counter()
+            results = await asyncio.gather(
+                *(farm.run("bench", f"session-{i}", "go") for i in range(num_requests))
+            )
+            elapsed = time.perf_counter() - started
+        throughput = num_requests / elapsed
+        baseline = baseline or throughput
+        pids = len({result["pid"] for result in results})
+        print(
+            f"{num_workers:3d} workers: {throughput:7.1f} req/s "
+            f"({throughput / baseline:.2f}x, {pids} processes used)"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark())
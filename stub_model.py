@@ -0,0 +1,54 @@
+import asyncio
+from typing import AsyncGenerator, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+from pydantic import PrivateAttr
+
+
+class StubLlm(BaseLlm):
+    """A local stand-in for Gemini used by the load tests and benchmarks.
+
+    On a fresh user turn it requests `tool_name` with `tool_args` (if set),
+    and once a function response comes back it answers with that response
+    as plain text. Every call is counted in `calls`.
+    """
+
+    model: str = "stub-llm"
+    latency: float = 0.0
+    tool_name: Optional[str] = None
+    tool_args: dict = {}
+
+    _calls: int = PrivateAttr(default=0)
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    def reset(self) -> None:
+        self._calls = 0
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        self._calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        last_part = llm_request.contents[-1].parts[0] if llm_request.contents else None
+        if last_part is not None and last_part.function_response:
+            response = last_part.function_response.response or {}
+            text = str(response.get("result", response))
+            part = types.Part(text=text)
+        elif self.tool_name:
+            part = types.Part(
+                function_call=types.FunctionCall(
+                    name=self.tool_name, args=dict(self.tool_args)
+                )
+            )
+        else:
+            part = types.Part(text="OK")
+
+        yield LlmResponse(content=types.Content(role="model", parts=[part]))
@@ -0,0 +1,86 @@
+import asyncio
+import os
+import sys
+
+import pytest
+from google.adk.agents import LlmAgent
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stub_model import StubLlm
+from tracing_plugin import TraceContext, TraceContextMiddleware, TracingPlugin
+
+
+class FailingLlm(StubLlm):
+    async def generate_content_async(self, llm_request, stream=False):
+        raise RuntimeError("model unavailable")
+        yield
+
+
+def _runner(plugin: TracingPlugin, model: StubLlm) -> InMemoryRunner:
+    agent = LlmAgent(name="traced_agent", model=model)
+    return InMemoryRunner(agent=agent, app_name="tracing_test", plugins=[plugin])
+
+
+async def _run(runner: InMemoryRunner, session_id: str, context=None) -> None:
+    async def app(scope, receive, send):
+        await runner.session_service.create_session(
+            app_name="tracing_test", user_id="user", session_id=session_id
+        )
+        message = types.Content(role="user", parts=[types.Part(text="hi")])
+        async for _ in runner.run_async(
+            user_id="user", session_id=session_id, new_message=message
+        ):
+            pass
+
+    # Runs the turn the way the A2A server does, behind the middleware.
+    headers = [(b"traceparent", context.to_traceparent().encode())] if context else []
+    await TraceContextMiddleware(app)({"type": "http", "headers": headers}, None, None)
+
+
+def test_overlapping_runs_sharing_a_remote_trace_export_separately():
+    exported = []
+    plugin = TracingPlugin(exporter=exported.append)
+    runner = _runner(plugin, StubLlm(latency=0.05))
+    caller = TraceContext("ab" * 16, "cd" * 8, sampled=True)
+
+    async def main():
+        await asyncio.gather(_run(runner, "s1", caller), _run(runner, "s2", caller))
+
+    asyncio.run(main())
+
+    assert exported == list(plugin.finished_traces)
+    assert len(exported) == 2
+    roots = [spans[0] for spans in exported]
+    assert {root.attributes["session_id"] for root in roots} == {"s1", "s2"}
+    for spans in exported:
+        root = spans[0]
+        assert root.kind == "invocation"
+        assert root.trace_id == caller.trace_id
+        assert root.parent_id == caller.span_id
+        assert [span.kind for span in spans] == ["invocation", "agent", "model"]
+        assert all(span.end_ns is not None and span.error is None for span in spans)
+        # Each run's spans descend from its own root only.
+        ids = {span.span_id for span in spans}
+        assert all(span.parent_id in ids for span in spans[1:])
+
+
+def test_failed_run_is_closed_with_error_and_exported():
+    exported = []
+    plugin = TracingPlugin(exporter=exported.append)
+
+    with pytest.raises(RuntimeError, match="model unavailable"):
+        asyncio.run(_run(_runner(plugin, FailingLlm()), "s1"))
+
+    assert len(exported) == 1
+    spans = exported[0]
+    assert spans[0].kind == "invocation"
+    assert all(span.end_ns is not None for span in spans)
+    assert "model unavailable" in spans[0].error
+
+    # Nothing from the failed run leaks into the next trace.
+    asyncio.run(_run(_runner(plugin, StubLlm()), "s2"))
+    assert len(exported) == 2
+    assert [span.kind for span in exported[1]] == ["invocation", "agent", "model"]
+    assert exported[1][0].trace_id != spans[0].trace_id
@@ -0,0 +1,188 @@
+import copy
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.plugins.base_plugin import BasePlugin
+
+
+# --- 1. Per-tool cache ---
+class ToolCache:
+    """A bounded LRU of tool results with a TTL, shared by every runner.
+
+    Entries live in the process, not in a session, so any session or runner
+    calling the same decorated tool with the same arguments gets a hit.
+    """
+
+    def __init__(
+        self,
+        func: Callable,
+        ttl: float,
+        maxsize: int,
+        tags: Iterable[str] = (),
+        normalize_strings: bool = False,
+        cache_errors: bool = False,
+    ) -> None:
+        self.name = func.__name__
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.tags = frozenset(tags)
+        self.normalize_strings = normalize_strings
+        self.cache_errors = cache_errors
+        self._signature = inspect.signature(func)
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.invalidations: int = 0
+
+    def key(self, *args: Any, **kwargs: Any) -> str:
+        """Canonicalizes a call's arguments, ignoring the ToolContext."""
+        bound = self._signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = {}
+        for name, value in bound.arguments.items():
+            if name == "tool_context":
+                continue
+            if self.normalize_strings and isinstance(value, str):
+                value = value.strip().lower()
+            arguments[name] = value
+        return json.dumps(arguments, sort_keys=True, default=repr)
+
+    def get(self, key: str) -> tuple:
+        """Returns (True, value) on a live hit, (False, None) otherwise."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, copy.deepcopy(value)
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key: str, value: Any) -> None:
+        if not self.cache_errors and isinstance(value, dict) and value.get("status") == "error":
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *args: Any, **kwargs: Any) -> None:
+        """Drops one cached call, e.g. `get_exchange_rate.cache.invalidate("USD", "EUR")`."""
+        key = self.key(*args, **kwargs)
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / calls if calls else 0.0,
+            "size": len(self._entries),
+            "invalidations": self.invalidations,
+        }
+
+
+_TOOL_CACHES: Dict[str, ToolCache] = {}
+
+
+# --- 2. Decorator ---
+def cached_tool(
+    ttl: float = 300.0,
+    maxsize: int = 256,
+    tags: Iterable[str] = (),
+    normalize_strings: bool = False,
+    cache_errors: bool = False,
+) -> Callable[[Callable], Callable]:
+    """Marks a pure tool as cacheable.
+
+    Args:
+      ttl: Seconds a result stays valid.
+      maxsize: Maximum number of cached argument combinations (LRU).
+      tags: Names for invalidation hooks, see `invalidate_tag`.
+      normalize_strings: Strip and lower-case string arguments for the key.
+        Only for tools that ignore case and surrounding whitespace themselves.
+      cache_errors: Also cache dict results whose "status" is "error".
+
+    The wrapper keeps the tool's name, docstring and signature, so ADK builds
+    the same function declaration as for the undecorated tool.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        cache = ToolCache(func, ttl, maxsize, tags, normalize_strings, cache_errors)
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def wrapper(*args: Any, **kwargs: Any) -> Any:
+                key = cache.key(*args, **kwargs)
+                hit, value = cache.get(key)
+                if hit:
+                    return value
+                value = await func(*args, **kwargs)
+                cache.put(key, value)
+                return value
+
+        else:
+
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                key = cache.key(*args, **kwargs)
+                hit, value = cache.get(key)
+                if hit:
+                    return value
+                value = func(*args, **kwargs)
+                cache.put(key, value)
+                return value
+
+        wrapper.cache = cache
+        _TOOL_CACHES[f"{func.__module__}.{func.__qualname__}"] = cache
+        return wrapper
+
+    return decorator
+
+
+# --- 3. Invalidation hooks and stats ---
+def invalidate_tag(tag: str) -> None:
+    """Clears every tool cache tagged with `tag`, e.g. when a rate table changes."""
+    for cache in _TOOL_CACHES.values():
+        if tag in cache.tags:
+            cache.clear()
+
+
+def tool_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Returns hit/miss stats for every decorated tool, keyed by module.qualname."""
+    return {name: cache.stats() for name, cache in _TOOL_CACHES.items()}
+
+
+class ToolCacheMetricsPlugin(BasePlugin):
+    """Logs tool cache hit/miss stats after each run and keeps the last snapshot."""
+
+    def __init__(self) -> None:
+        super().__init__(name="tool_cache_metrics")
+        self.last_stats: Optional[Dict[str, Dict[str, Any]]] = None
+
+    async def after_run_callback(
+        self, *, invocation_context: InvocationContext
+    ) -> None:
+        self.last_stats = tool_cache_stats()
+        for name, stats in self.last_stats.items():
+            logging.info(f"[Plugin] Tool cache {name}: {stats}")
@@ -0,0 +1,444 @@
+import contextvars
+import json
+import os
+import random
+import re
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import httpx
+from google.adk.agents.base_agent import BaseAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.plugins.base_plugin import BasePlugin
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+
+TRACEPARENT_HEADER = "traceparent"
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+# --- 1. Spans and trace context ---
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    kind: str  # invocation | agent | remote_agent | model | tool
+    start_ns: int
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration_ns(self) -> int:
+        return (self.end_ns or time.time_ns()) - self.start_ns
+
+
+@dataclass(frozen=True)
+class TraceContext:
+    """The (trace id, parent span id, sampled) triple carried across hops."""
+
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+    def to_traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def from_traceparent(cls, value: Optional[str]) -> Optional["TraceContext"]:
+        match = _TRACEPARENT_RE.match((value or "").strip().lower())
+        if match is None:
+            return None
+        trace_id, span_id, flags = match.groups()
+        return cls(trace_id, span_id, sampled=bool(int(flags, 16) & 1))
+
+
+# The innermost open span of the running task; read when a hop starts.
+_current_context: contextvars.ContextVar[Optional[TraceContext]] = contextvars.ContextVar(
+    "adk_trace_context", default=None
+)
+
+
+def _new_id(num_bytes: int) -> str:
+    return os.urandom(num_bytes).hex()
+
+
+# --- 2. Propagation over A2A HTTP ---
+async def inject_trace_headers(request: httpx.Request) -> None:
+    """httpx request hook that adds a W3C `traceparent` header for the open span."""
+    context = _current_context.get()
+    if context is not None:
+        request.headers[TRACEPARENT_HEADER] = context.to_traceparent()
+
+
+def traced_httpx_client(**kwargs: Any) -> httpx.AsyncClient:
+    """An httpx client for `RemoteA2aAgent(httpx_client=...)` that propagates traces."""
+    kwargs.setdefault("timeout", httpx.Timeout(600.0))
+    kwargs.setdefault("event_hooks", {"request": [inject_trace_headers]})
+    return httpx.AsyncClient(**kwargs)
+
+
+class TraceContextMiddleware:
+    """ASGI middleware that continues a caller's trace on the A2A server side.
+
+    Usage:
+      app = to_a2a(agent, runner=Runner(..., plugins=[TracingPlugin()]))
+      app.add_middleware(TraceContextMiddleware)
+    """
+
+    def __init__(self, app: Callable) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] == "http":
+            for name, value in scope.get("headers", []):
+                if name == TRACEPARENT_HEADER.encode("latin-1"):
+                    context = TraceContext.from_traceparent(value.decode("latin-1"))
+                    if context is not None:
+                        _current_context.set(context)
+                    break
+        await self.app(scope, receive, send)
+
+
+# --- 3. Tracing plugin ---
+class TracingPlugin(BasePlugin):
+    """Builds a span tree per invocation: invocation > agent > model/tool.
+
+    AgentTool sub-runs reuse this plugin and nest under the calling tool span;
+    RemoteA2aAgent hops nest under their agent span and, with
+    `traced_httpx_client`, continue on the server under the same trace id.
+
+    Spans are kept per root invocation, not per trace id, so concurrent runs
+    that continue the same remote trace are recorded and exported separately.
+    Failed runs are closed with the error and exported like any other.
+
+    Sampling is decided once at the root (`sample_rate`) and inherited by
+    every nested invocation and remote hop, so unsampled runs cost a dict
+    lookup per callback.
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 1.0,
+        max_traces: int = 100,
+        exporter: Optional[Callable[[List[Span]], None]] = None,
+    ) -> None:
+        super().__init__(name="tracing")
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+        self.finished_traces: Deque[List[Span]] = deque(maxlen=max_traces)
+        self._traces: Dict[str, List[Span]] = {}  # root invocation_id -> spans
+        self._trace_keys: Dict[str, str] = {}  # invocation_id -> root invocation_id
+        self._span_owners: Dict[str, str] = {}  # span_id -> root invocation_id
+        self._roots: Dict[str, Span] = {}  # invocation_id -> invocation span
+        self._outer_contexts: Dict[str, Optional[TraceContext]] = {}
+        self._agent_stacks: Dict[str, List[Span]] = defaultdict(list)
+        self._model_spans: Dict[tuple, Span] = {}  # (invocation_id, agent) -> span
+        self._tool_spans: Dict[tuple, Span] = {}  # (invocation_id, call id) -> span
+
+    def _record(self, invocation_id: str, span: Span) -> None:
+        key = self._trace_keys.get(invocation_id)
+        spans = self._traces.get(key) if key is not None else None
+        if spans is not None:
+            spans.append(span)
+            self._span_owners[span.span_id] = key
+
+    def _start(
+        self, invocation_id: str, parent: Span, name: str, kind: str, **attributes: Any
+    ) -> Span:
+        span = Span(
+            trace_id=parent.trace_id,
+            span_id=_new_id(8),
+            parent_id=parent.span_id,
+            name=name,
+            kind=kind,
+            start_ns=time.time_ns(),
+            attributes=attributes,
+        )
+        self._record(invocation_id, span)
+        _current_context.set(TraceContext(span.trace_id, span.span_id, True))
+        return span
+
+    def _end(self, span: Span, error: Optional[BaseException] = None) -> None:
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        parent_id = span.parent_id
+        _current_context.set(
+            TraceContext(span.trace_id, parent_id, True) if parent_id else None
+        )
+
+    def _parent(self, invocation_id: str) -> Optional[Span]:
+        stack = self._agent_stacks.get(invocation_id)
+        return stack[-1] if stack else self._roots.get(invocation_id)
+
+    def _finish(
+        self, invocation_context: InvocationContext, error: Optional[BaseException] = None
+    ) -> None:
+        """Closes an invocation's spans and exports them if it is a root run."""
+        invocation_id = invocation_context.invocation_id
+        root = self._roots.pop(invocation_id, None)
+        key = self._trace_keys.pop(invocation_id, None)
+        open_spans = list(reversed(self._agent_stacks.pop(invocation_id, [])))
+        for spans in (self._model_spans, self._tool_spans):
+            for span_key in [k for k in spans if k[0] == invocation_id]:
+                open_spans.append(spans.pop(span_key))
+        outer = self._outer_contexts.pop(invocation_id, None)
+        if root is None:
+            _current_context.set(outer)
+            return
+
+        for span in open_spans + [root]:
+            if span.end_ns is None:
+                self._end(span, error)
+        _current_context.set(outer)
+        if key != invocation_id:
+            return  # A nested AgentTool run; the outer invocation exports.
+        spans = self._traces.pop(key, [])
+        for span in spans:
+            self._span_owners.pop(span.span_id, None)
+        self.finished_traces.append(spans)
+        if self.exporter is not None:
+            self.exporter(spans)
+
+    async def before_run_callback(
+        self, *, invocation_context: InvocationContext
+    ) -> None:
+        invocation_id = invocation_context.invocation_id
+        incoming = _current_context.get()
+        self._outer_contexts[invocation_id] = incoming
+        if incoming is not None:
+            if not incoming.sampled:
+                return
+            trace_id, parent_id = incoming.trace_id, incoming.span_id
+        elif random.random() < self.sample_rate:
+            trace_id, parent_id = _new_id(16), None
+        else:
+            _current_context.set(TraceContext(_new_id(16), _new_id(8), False))
+            return
+
+        root = Span(
+            trace_id=trace_id,
+            span_id=_new_id(8),
+            parent_id=parent_id,
+            name=f"invocation {invocation_context.app_name}",
+            kind="invocation",
+            start_ns=time.time_ns(),
+            attributes={
+                "invocation_id": invocation_id,
+                "session_id": invocation_context.session.id,
+            },
+        )
+        # A parent span recorded here means a nested AgentTool run; anything
+        # else (a new trace or a remote caller's span) starts its own root.
+        key = self._span_owners.get(parent_id) if parent_id else None
+        if key is None:
+            key = invocation_id
+            self._traces[key] = []
+        self._trace_keys[invocation_id] = key
+        self._record(invocation_id, root)
+        self._roots[invocation_id] = root
+        _current_context.set(TraceContext(trace_id, root.span_id, True))
+
+    async def after_run_callback(
+        self, *, invocation_context: InvocationContext
+    ) -> None:
+        self._finish(invocation_context)
+
+    async def on_run_error_callback(
+        self, *, invocation_context: InvocationContext, error: Exception
+    ) -> None:
+        self._finish(invocation_context, error)
+
+    async def before_agent_callback(
+        self, *, agent: BaseAgent, callback_context: CallbackContext
+    ) -> None:
+        parent = self._parent(callback_context.invocation_id)
+        if parent is None:
+            return
+        remote = type(agent).__name__ == "RemoteA2aAgent"
+        span = self._start(
+            callback_context.invocation_id,
+            parent,
+            f"agent {agent.name}",
+            "remote_agent" if remote else "agent",
+        )
+        self._agent_stacks[callback_context.invocation_id].append(span)
+
+    def _end_agent(
+        self,
+        agent: BaseAgent,
+        callback_context: CallbackContext,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        stack = self._agent_stacks.get(callback_context.invocation_id)
+        if not stack:
+            return
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i].name == f"agent {agent.name}":
+                self._end(stack.pop(i), error)
+                break
+
+    async def after_agent_callback(
+        self, *, agent: BaseAgent, callback_context: CallbackContext
+    ) -> None:
+        self._end_agent(agent, callback_context)
+
+    async def on_agent_error_callback(
+        self, *, agent: BaseAgent, callback_context: CallbackContext, error: Exception
+    ) -> None:
+        self._end_agent(agent, callback_context, error)
+
+    async def before_model_callback(
+        self, *, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> None:
+        parent = self._parent(callback_context.invocation_id)
+        if parent is None:
+            return
+        key = (callback_context.invocation_id, callback_context.agent_name)
+        self._model_spans[key] = self._start(
+            callback_context.invocation_id,
+            parent,
+            f"model {llm_request.model or 'llm'}",
+            "model",
+            num_contents=len(llm_request.contents),
+        )
+
+    async def after_model_callback(
+        self, *, callback_context: CallbackContext, llm_response: LlmResponse
+    ) -> None:
+        if llm_response.partial:
+            return
+        key = (callback_context.invocation_id, callback_context.agent_name)
+        span = self._model_spans.pop(key, None)
+        if span is not None:
+            usage = llm_response.usage_metadata
+            if usage is not None:
+                span.attributes["prompt_tokens"] = usage.prompt_token_count
+                span.attributes["output_tokens"] = usage.candidates_token_count
+            self._end(span)
+
+    async def on_model_error_callback(
+        self,
+        *,
+        callback_context: CallbackContext,
+        llm_request: LlmRequest,
+        error: Exception,
+    ) -> None:
+        key = (callback_context.invocation_id, callback_context.agent_name)
+        span = self._model_spans.pop(key, None)
+        if span is not None:
+            self._end(span, error)
+
+    async def before_tool_callback(
+        self, *, tool: BaseTool, tool_args: Dict[str, Any], tool_context: ToolContext
+    ) -> None:
+        parent = self._parent(tool_context.invocation_id)
+        if parent is None:
+            return
+        key = (tool_context.invocation_id, tool_context.function_call_id)
+        self._tool_spans[key] = self._start(
+            tool_context.invocation_id, parent, f"tool {tool.name}", "tool"
+        )
+
+    async def after_tool_callback(
+        self,
+        *,
+        tool: BaseTool,
+        tool_args: Dict[str, Any],
+        tool_context: ToolContext,
+        result: Dict[str, Any],
+    ) -> None:
+        key = (tool_context.invocation_id, tool_context.function_call_id)
+        span = self._tool_spans.pop(key, None)
+        if span is not None:
+            self._end(span)
+
+    async def on_tool_error_callback(
+        self,
+        *,
+        tool: BaseTool,
+        tool_args: Dict[str, Any],
+        tool_context: ToolContext,
+        error: Exception,
+    ) -> None:
+        key = (tool_context.invocation_id, tool_context.function_call_id)
+        span = self._tool_spans.pop(key, None)
+        if span is not None:
+            self._end(span, error)
+
+
+# --- 4. Exporters ---
+def to_otlp_json(spans: List[Span], service_name: str = "adk-agents") -> Dict[str, Any]:
+    """Converts spans to the OTLP/JSON `ExportTraceServiceRequest` shape."""
+    span_kinds = {"remote_agent": 3}  # SPAN_KIND_CLIENT; everything else INTERNAL.
+
+    def attribute(key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    otlp_spans = []
+    for span in spans:
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": span_kinds.get(span.kind, 1),
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns or span.start_ns),
+            "attributes": [attribute("adk.span_kind", span.kind)]
+            + [attribute(k, v) for k, v in span.attributes.items() if v is not None],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        otlp_spans.append(otlp_span)
+
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [attribute("service.name", service_name)]},
+                "scopeSpans": [{"scope": {"name": "tracing_plugin"}, "spans": otlp_spans}],
+            }
+        ]
+    }
+
+
+def to_collapsed_stacks(spans: List[Span]) -> List[str]:
+    """Converts spans to `frame;frame;frame <self-time-us>` lines for flamegraph.pl."""
+    by_id = {span.span_id: span for span in spans}
+    child_time: Dict[str, int] = defaultdict(int)
+    for span in spans:
+        if span.parent_id in by_id:
+            child_time[span.parent_id] += span.duration_ns
+
+    lines = []
+    for span in spans:
+        frames = []
+        node: Optional[Span] = span
+        while node is not None:
+            frames.append(node.name.replace(";", ":").replace(" ", ":", 1))
+            node = by_id.get(node.parent_id)
+        self_us = max(span.duration_ns - child_time[span.span_id], 0) // 1000
+        if self_us:
+            lines.append(f"{';'.join(reversed(frames))} {self_us}")
+    return lines
+
+
+def write_traces(traces: List[List[Span]], otlp_path: str, collapsed_path: str) -> None:
+    """Writes traces as one OTLP/JSON document and one collapsed-stack file."""
+    spans = [span for trace in traces for span in trace]
+    with open(otlp_path, "w") as f:
+        json.dump(to_otlp_json(spans), f)
+    with open(collapsed_path, "w") as f:
+        f.write("\n".join(to_collapsed_stacks(spans)) + "\n")
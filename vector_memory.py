@@ -0,0 +1,419 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from google.adk.memory.base_memory_service import BaseMemoryService, SearchMemoryResponse
+from google.adk.memory.memory_entry import MemoryEntry
+from google.adk.sessions.session import Session
+from google.genai import types
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+# --- 1. Local hashing embedder ---
+class HashingEmbedder:
+    """Embeds text by feature-hashing its words and word bigrams.
+
+    No model download and no network: similar wording gives similar vectors,
+    which is enough to pull the right past turns back into context.
+    """
+
+    def __init__(self, dim: int = 256) -> None:
+        self.dim = dim
+
+    def embed(self, texts: Iterable[str]) -> np.ndarray:
+        texts = list(texts)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = _TOKEN_RE.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                h = zlib.crc32(feature.encode("utf-8"))
+                vectors[row, (h & 0x7FFFFFFF) % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+# --- 2. On-disk IVF index ---
+class IVFIndex:
+    """An inverted-file ANN index over memory-mapped float32 vectors.
+
+    Vectors, owner ids and list assignments live in flat files under `path`
+    and grow by doubling. Once `train_size` vectors are stored, spherical
+    k-means splits them into ~sqrt(n) lists; a query only scores the vectors
+    in its `nprobe` closest lists. The lists are re-clustered whenever the
+    index has grown 16x since the last training.
+
+    Owners (one per app/user) with few vectors are scanned exactly, so a
+    small user's memories are never lost to probing.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dim: int,
+        nprobe: int = 64,
+        train_size: int = 4096,
+        exact_owner_limit: int = 2048,
+    ) -> None:
+        self.path = path
+        self.dim = dim
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self.exact_owner_limit = exact_owner_limit
+        os.makedirs(path, exist_ok=True)
+
+        meta_path = os.path.join(path, "meta.json")
+        meta = {"count": 0, "capacity": 0, "trained_at": 0}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+        self.count: int = meta["count"]
+        self.trained_at: int = meta["trained_at"]
+        self._capacity = 0
+        self._open(max(meta["capacity"], 1024))
+
+        centroids_path = os.path.join(path, "centroids.npy")
+        self.centroids: Optional[np.ndarray] = (
+            np.load(centroids_path) if self.trained_at else None
+        )
+        self._owner_counts: Dict[int, int] = {}
+        self._lists: List[np.ndarray] = []
+        self._rebuild_lists()
+
+    def _open(self, capacity: int) -> None:
+        def mapped(name: str, dtype, shape) -> np.memmap:
+            file_path = os.path.join(self.path, name)
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            with open(file_path, "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+            return np.memmap(file_path, dtype=dtype, mode="r+", shape=shape)
+
+        self._vectors = mapped("vectors.f32", np.float32, (capacity, self.dim))
+        self._owners = mapped("owners.i32", np.int32, (capacity,))
+        self._assignments = mapped("lists.i32", np.int32, (capacity,))
+        self._capacity = capacity
+
+    def _rebuild_lists(self) -> None:
+        owners = self._owners[: self.count]
+        ids, counts = np.unique(owners, return_counts=True)
+        self._owner_counts = dict(zip(ids.tolist(), counts.tolist()))
+        if self.centroids is None:
+            self._lists = []
+            return
+        assignments = self._assignments[: self.count]
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(len(self.centroids) + 1))
+        self._lists = [order[bounds[i] : bounds[i + 1]] for i in range(len(self.centroids))]
+
+    def _save_meta(self) -> None:
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(
+                {"count": self.count, "capacity": self._capacity, "trained_at": self.trained_at}, f
+            )
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), 65536):
+            chunk = vectors[start : start + 65536]
+            assignments[start : start + len(chunk)] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return assignments
+
+    def _train(self, iterations: int = 8) -> None:
+        nlist = max(16, int(math.sqrt(self.count)))
+        rng = np.random.default_rng(0)
+        sample_ids = rng.choice(self.count, size=min(self.count, nlist * 32), replace=False)
+        sample = np.asarray(self._vectors[np.sort(sample_ids)])
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            sums[empty] = centroids[empty]
+            norms[empty] = 1.0
+            centroids = sums / norms
+
+        self.centroids = centroids.astype(np.float32)
+        np.save(os.path.join(self.path, "centroids.npy"), self.centroids)
+        self._assignments[: self.count] = self._assign(self._vectors[: self.count])
+        self.trained_at = self.count
+
+    def add(self, vectors: np.ndarray, owner: int) -> range:
+        """Appends vectors for one owner and returns their ids."""
+        start, end = self.count, self.count + len(vectors)
+        if end > self._capacity:
+            self._vectors.flush()
+            self._open(max(end, self._capacity * 2))
+        self._vectors[start:end] = vectors
+        self._owners[start:end] = owner
+        self._owner_counts[owner] = self._owner_counts.get(owner, 0) + len(vectors)
+        self.count = end
+
+        if self.count >= self.train_size and (
+            self.trained_at == 0 or self.count >= self.trained_at * 16
+        ):
+            self._train()
+            self._rebuild_lists()
+        elif self.centroids is not None:
+            assignments = self._assign(vectors)
+            self._assignments[start:end] = assignments
+            for list_id in np.unique(assignments):
+                new_ids = np.arange(start, end)[assignments == list_id]
+                self._lists[list_id] = np.concatenate([self._lists[list_id], new_ids])
+        self._save_meta()
+        return range(start, end)
+
+    def search(self, query: np.ndarray, k: int, owner: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Returns up to `k` (id, cosine score) pairs, best first."""
+        owner_count = self._owner_counts.get(owner, 0) if owner is not None else self.count
+        if owner_count == 0:
+            return []
+        if self.centroids is None or owner_count <= self.exact_owner_limit:
+            if owner is None:
+                candidates = np.arange(self.count)
+            else:
+                candidates = np.flatnonzero(self._owners[: self.count] == owner)
+        else:
+            probes = np.argpartition(-(self.centroids @ query), min(self.nprobe, len(self.centroids) - 1))
+            candidates = np.concatenate([self._lists[i] for i in probes[: self.nprobe]])
+            if owner is not None:
+                candidates = candidates[self._owners[candidates] == owner]
+        if len(candidates) == 0:
+            return []
+
+        scores = self._vectors[np.sort(candidates)] @ query
+        candidates = np.sort(candidates)
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def flush(self) -> None:
+        self._vectors.flush()
+        self._owners.flush()
+        self._assignments.flush()
+        self._save_meta()
+
+
+# --- 3. Memory service ---
+class VectorMemoryService(BaseMemoryService):
+    """Long-term memory over past events, searched by local embeddings.
+
+    Event text and metadata go into SQLite next to the vector index, so the
+    memory survives restarts and is shared by every session of a user.
+    `search_memory` returns the `top_k` closest past events instead of whole
+    session histories; pair it with the `preload_memory` tool to inject them
+    into each turn.
+
+    `nprobe` trades recall for latency once a user has more than a couple of
+    thousand memories; raise it if search misses events it should find.
+    """
+
+    def __init__(
+        self,
+        root_dir: str = "agent_memory",
+        dim: int = 256,
+        top_k: int = 5,
+        nprobe: int = 64,
+        embedder: Optional[HashingEmbedder] = None,
+    ) -> None:
+        self.top_k = top_k
+        self.embedder = embedder or HashingEmbedder(dim)
+        self.index = IVFIndex(
+            os.path.join(root_dir, "index"), self.embedder.dim, nprobe=nprobe
+        )
+        self._db = sqlite3.connect(os.path.join(root_dir, "memories.db"))
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS owners (
+                id INTEGER PRIMARY KEY, app_name TEXT, user_id TEXT,
+                UNIQUE (app_name, user_id)
+            );
+            CREATE TABLE IF NOT EXISTS memories (
+                id INTEGER PRIMARY KEY, event_id TEXT UNIQUE, session_id TEXT,
+                author TEXT, timestamp REAL, text TEXT
+            );
+            """
+        )
+        # Rows are committed before their vectors are added; drop rows whose
+        # vectors never made it into the index so the events get re-indexed.
+        with self._db:
+            self._db.execute("DELETE FROM memories WHERE id >= ?", (self.index.count,))
+
+    def _owner_id(self, app_name: str, user_id: str, create: bool = False) -> Optional[int]:
+        row = self._db.execute(
+            "SELECT id FROM owners WHERE app_name = ? AND user_id = ?", (app_name, user_id)
+        ).fetchone()
+        if row is not None or not create:
+            return row[0] if row else None
+        with self._db:
+            return self._db.execute(
+                "INSERT INTO owners (app_name, user_id) VALUES (?, ?)", (app_name, user_id)
+            ).lastrowid
+
+    def add_texts(
+        self,
+        app_name: str,
+        user_id: str,
+        records: List[Tuple[str, str, str, float, str]],
+    ) -> int:
+        """Indexes (event_id, session_id, author, timestamp, text) records; skips known ids."""
+        known = set()
+        event_ids = [record[0] for record in records]
+        for start in range(0, len(event_ids), 500):
+            chunk = event_ids[start : start + 500]
+            known.update(
+                row[0]
+                for row in self._db.execute(
+                    f"SELECT event_id FROM memories WHERE event_id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+            )
+        records = [record for record in records if record[0] not in known]
+        if not records:
+            return 0
+
+        owner = self._owner_id(app_name, user_id, create=True)
+        vectors = self.embedder.embed(record[4] for record in records)
+        # Text first, vectors second: a crash in between leaves rows without
+        # vectors, which __init__ cleans up, never vectors without rows.
+        ids = range(self.index.count, self.index.count + len(records))
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO memories (id, event_id, session_id, author, timestamp, text)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [(memory_id, *record) for memory_id, record in zip(ids, records)],
+            )
+        self.index.add(vectors, owner)
+        return len(records)
+
+    async def add_session_to_memory(self, session: Session) -> None:
+        records = []
+        for event in session.events:
+            if not event.content or not event.content.parts:
+                continue
+            text = " ".join(part.text for part in event.content.parts if part.text)
+            if text.strip():
+                records.append((event.id, session.id, event.author, event.timestamp, text))
+        self.add_texts(session.app_name, session.user_id, records)
+
+    async def search_memory(
+        self, *, app_name: str, user_id: str, query: str
+    ) -> SearchMemoryResponse:
+        owner = self._owner_id(app_name, user_id)
+        if owner is None:
+            return SearchMemoryResponse()
+        hits = self.index.search(self.embedder.embed([query])[0], self.top_k, owner)
+        if not hits:
+            return SearchMemoryResponse()
+
+        rows = {
+            row[0]: row
+            for row in self._db.execute(
+                f"SELECT id, author, timestamp, text FROM memories WHERE id IN ({','.join('?' * len(hits))})",
+                [memory_id for memory_id, _ in hits],
+            )
+        }
+        memories = []
+        for memory_id, score in hits:
+            if memory_id not in rows:
+                continue  # Vector without text, e.g. from an interrupted write.
+            _, author, timestamp, text = rows[memory_id]
+            memories.append(
+                MemoryEntry(
+                    content=types.Content(
+                        role="user" if author == "user" else "model",
+                        parts=[types.Part(text=text)],
+                    ),
+                    author=author,
+                    timestamp=datetime.fromtimestamp(timestamp).isoformat(),
+                    custom_metadata={"score": round(score, 4)},
+                )
+            )
+        return SearchMemoryResponse(memories=memories)
+
+    def close(self) -> None:
+        self.index.flush()
+        self._db.close()
+
+
+# --- 4. Benchmark: recall and latency at 10k / 1M stored events ---
+def _benchmark(sizes: List[int], num_queries: int = 200, k: int = 10) -> None:
+    rng = np.random.default_rng(42)
+    vocabulary = np.array([f"w{i}" for i in range(50000)])
+    # Conversations cluster by topic: each topic reuses its own few words.
+    topics = rng.choice(len(vocabulary), size=(2000, 40))
+    embedder = HashingEmbedder(dim=256)
+
+    def make_events(n: int) -> List[str]:
+        topic_ids = rng.integers(0, len(topics), size=n)
+        lengths = rng.integers(8, 20, size=n)
+        picks = rng.integers(0, topics.shape[1], size=(n, 20))
+        return [
+            " ".join(vocabulary[topics[t, row[:length]]])
+            for t, row, length in zip(topic_ids, picks, lengths)
+        ]
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as root_dir:
+            index = IVFIndex(root_dir, embedder.dim, exact_owner_limit=0)
+            query_ids = set(rng.choice(size, size=num_queries, replace=False).tolist())
+            query_texts = {}
+            started = time.perf_counter()
+            for start in range(0, size, 50000):
+                texts = make_events(min(50000, size - start))
+                query_texts.update(
+                    (start + i, text) for i, text in enumerate(texts) if start + i in query_ids
+                )
+                index.add(embedder.embed(texts), owner=1)
+            build_seconds = time.perf_counter() - started
+
+            # A later question repeats only part of an earlier turn: drop ~40%
+            # of the stored event's words and ask for it back.
+            queries = []
+            for memory_id, text in query_texts.items():
+                words = text.split()
+                kept = [w for w in words if rng.random() > 0.4] or words[:1]
+                query = embedder.embed([" ".join(kept)])[0]
+                exact_scores = np.asarray(index._vectors[: index.count] @ query)
+                exact = np.argpartition(-exact_scores, k)[:k].tolist()
+                queries.append((memory_id, query, set(exact)))
+            exact_hits = np.mean([memory_id in exact for memory_id, _, exact in queries])
+            print(
+                f"{size:>9,d} events: build {build_seconds:6.1f}s, {len(index.centroids)} lists, "
+                f"exact search finds the source event in top-{k} {exact_hits:.3f}"
+            )
+
+            for nprobe in (16, 32, 64, 128):
+                index.nprobe = nprobe
+                recalls, source_hits, latencies = [], [], []
+                for memory_id, query, exact in queries:
+                    started = time.perf_counter()
+                    found = {found_id for found_id, _ in index.search(query, k, owner=1)}
+                    latencies.append(time.perf_counter() - started)
+                    recalls.append(len(exact & found) / k)
+                    source_hits.append(memory_id in found)
+
+                latencies_ms = np.array(latencies) * 1000
+                print(
+                    f"    nprobe {nprobe:3d}: recall@{k} vs exact {np.mean(recalls):.3f}, "
+                    f"source event in top-{k} {np.mean(source_hits):.3f}, "
+                    f"p50 {np.percentile(latencies_ms, 50):6.2f} ms, "
+                    f"p95 {np.percentile(latencies_ms, 95):6.2f} ms"
+                )
+
+
+if __name__ == "__main__":
+    _benchmark([int(size) for size in sys.argv[1:]] or [10_000, 1_000_000])